@@ -1,15 +1,99 @@
-from fastapi import FastAPI
+import atexit
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from pydantic import BaseModel
-import joblib
+from starlette.concurrency import run_in_threadpool
 import pandas as pd
-import shap
+
+from scripts.admission import AdmissionController, AdmissionMiddleware
+from scripts.audit_log import AuditLogger
+from scripts.lazy_imports import import_report, lazy_module, timed_import
+
+# Feature modules are imported by the first request that needs them (see /ready for timings)
+pa = lazy_module("pyarrow")
+bulk_scoring = lazy_module("scripts.bulk_scoring")
+counterfactual = lazy_module("scripts.counterfactual")
+event_ingest = lazy_module("scripts.event_ingest")
+explainability = lazy_module("scripts.explainability")
+partitioned_store = lazy_module("scripts.partitioned_store")
+scoring = lazy_module("scripts.scoring")
+similarity = lazy_module("scripts.similarity")
+stress_test = lazy_module("scripts.stress_test")
+work_queue = lazy_module("scripts.work_queue")
 
 app = FastAPI()
 
+# Bounded concurrency + per-lane queues; excess load gets 503 + Retry-After (see /admission/stats)
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
 # 1. LOAD AI ASSETS
-model = joblib.load('credit_risk_model.pkl')
-encoder = joblib.load('ordinal_encoder.pkl')
-explainer = shap.TreeExplainer(model)
+# Artifacts live in models/ (override with AGRIGUARD_MODEL_DIR). They load on a
+# background thread so the server accepts connections at once; /ready reports
+# when scoring can start. The SHAP explainer is warmed afterwards unless
+# AGRIGUARD_PREWARM_SHAP=0, in which case the first explained request builds it.
+model = encoder = feature_order = None
+DATA_FILE_PATH = os.path.join("data", "processed", "1_processed_loan_data_csv.csv")
+READY_WAIT_SECONDS = float(os.environ.get("AGRIGUARD_READY_WAIT", 30))
+_ready = threading.Event()
+_startup = {"error": None, "model_load_ms": None, "explainer_warm_ms": None}
+_started_at = time.perf_counter()
+
+
+def _load_assets():
+    global model, encoder, feature_order
+    try:
+        start = time.perf_counter()
+        model, encoder = scoring.load_model_assets()
+        feature_order = scoring.model_feature_order(model)
+        _startup["model_load_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    except Exception as e:
+        _startup["error"] = f"{type(e).__name__}: {e}"
+        return
+    finally:
+        _ready.set()
+    if os.environ.get("AGRIGUARD_PREWARM_SHAP", "1") != "0":
+        start = time.perf_counter()
+        try:
+            get_api_explainer()
+        except Exception as e:
+            # Not fatal: /analyze retries when it first needs the explainer
+            _startup["explainer_error"] = f"{type(e).__name__}: {e}"
+            return
+        _startup["explainer_warm_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def require_model(wait=READY_WAIT_SECONDS):
+    """Block until the model is loaded (503 + Retry-After if it is not ready in time or failed)."""
+    if not _ready.wait(wait) or _startup["error"]:
+        raise HTTPException(status_code=503, detail=_startup["error"] or "model is still loading",
+                            headers={"Retry-After": "5"})
+
+
+def get_api_explainer():
+    return explainability.get_explainer(model)
+
+
+@lru_cache(maxsize=1)
+def get_bulk_scorer():
+    return bulk_scoring.BulkScorer(model, encoder, feature_order=feature_order)
+
+
+def _audit_model_version():
+    return explainability.model_version(model)
+
+
+threading.Thread(target=_load_assets, name="agriguard-model-loader", daemon=True).start()
+
+# Decisions are queued here and written to data/audit/ by a background thread
+audit_log = AuditLogger(feature_names=lambda: feature_order, model_version=_audit_model_version)
+audit_log.start()
+atexit.register(audit_log.close)
 
 class FarmerData(BaseModel):
     division: str
@@ -17,8 +101,51 @@ class FarmerData(BaseModel):
     outstanding: float
     recovery: float
 
+class CounterfactualRequest(FarmerData):
+    threshold: float = 0.5
+
+class PaymentEvent(BaseModel):
+    customer_id: str
+    amount: float
+    month: Optional[str] = None  # Jan ... Dec (default: the current month)
+
+class ActionEvent(BaseModel):
+    customer_id: str
+    action: str  # No, Court or Adjudication_Board
+
+class RescoreEvent(BaseModel):
+    customer_id: str
+
+class RecoveryProfile(BaseModel):
+    loan_amount: float
+    outstanding: float
+    monthly_recovery: List[float]  # Jan ... Dec
+    k: int = 10
+
+class ShockSpec(BaseModel):
+    divisions: Optional[List[str]] = None  # None = every division
+    recovery_cut: float = 0.0
+    cut_spread: float = 0.0
+    delay_months: int = 0
+    probability: float = 1.0
+
+class StressTestRequest(BaseModel):
+    shocks: List[ShockSpec]
+    scenarios: int = 2000
+    lgd: float = 0.45
+    seed: int = 42
+
+class ProfileRecord(RecoveryProfile):
+    customer_id: str
+    division: str
+    loan_type: str = "Maha"
+    overdue_status: Optional[str] = None
+    action_taken: Optional[str] = None
+
 @app.post("/analyze")
 def analyze_farmer(data: FarmerData):
+    started = time.perf_counter()
+    require_model()
     # Feature Engineering (Calculated automatically)
     repayment_ratio = data.recovery / data.loan_amount
     debt_ratio = data.outstanding / data.loan_amount
@@ -42,12 +169,286 @@ def analyze_farmer(data: FarmerData):
     input_df[['Loan_Type', 'Officer_Assigned', 'Division']] = encoder.transform(
         input_df[['Loan_Type', 'Officer_Assigned', 'Division']]
     )
+    input_df = input_df[feature_order]
     
     risk_prob = model.predict_proba(input_df)[0][1]
-    shap_values = explainer.shap_values(input_df)
+    shap_values = get_api_explainer().shap_values(input_df)
 
-    return {
+    response = {
         "status": status,
         "risk_probability": round(float(risk_prob), 2),
         "explanation": shap_values[0].tolist()
-    }
\ No newline at end of file
+    }
+    inputs = {"division": data.division, "loan_amount": data.loan_amount,
+              "outstanding": data.outstanding, "recovery": data.recovery}
+    audit_log.log("/analyze", inputs, status, float(risk_prob), explainability.positive_class_shap(shap_values)[0],
+                  (time.perf_counter() - started) * 1000)
+    return response
+
+
+@app.post("/analyze/arrow")
+async def analyze_farmers_arrow(request: Request):
+    """Bulk scoring: Arrow IPC stream in (division, loan_amount, outstanding, recovery),
+    Arrow IPC stream out (status, risk_probability, shap_<feature>), one batch at a time."""
+    payload = await request.body()
+    await run_in_threadpool(require_model)
+    try:
+        scored = await run_in_threadpool(get_bulk_scorer().score_stream, payload)
+    except (pa.ArrowInvalid, KeyError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return Response(content=scored, media_type=bulk_scoring.ARROW_STREAM_MEDIA_TYPE)
+
+
+@app.post("/counterfactual")
+def counterfactual_farmer(data: CounterfactualRequest):
+    """Smallest extra repayment that brings this farmer's default probability below ``threshold``."""
+    require_model()
+    farmer = pd.DataFrame([{
+        'Loan_Type': 'Maha', 'Officer_Assigned': 'Yes', 'Division': data.division,
+        'Loan_Amount': data.loan_amount, 'Outstanding_Balance': data.outstanding, 'Total_Paid': data.recovery,
+    }])
+    X = scoring.build_model_frame(farmer, encoder, feature_order)
+    result = counterfactual.find_counterfactuals(model, X, data.threshold).iloc[0]
+    required = result['required_payment']
+    return {
+        "threshold": data.threshold,
+        "current_probability": round(float(result['current_probability']), 4),
+        "achievable": bool(result['achievable']),
+        "required_payment": None if pd.isna(required) else round(float(required), 2),
+        "new_probability": round(float(result['new_probability']), 4),
+        "payment_to_good_payer": round(float(counterfactual.payment_to_good_payer(data.loan_amount, data.recovery)), 2),
+    }
+
+
+@lru_cache(maxsize=64)
+def _division_portfolio(division, manifest_mtime):
+    # manifest_mtime keys the cache so a rebuilt partition store is picked up
+    return partitioned_store.load_partitions(partitioned_store.PARTITION_ROOT, divisions=[division])
+
+
+@app.get("/counterfactual/division/{division}")
+def counterfactual_division(division: str, threshold: float = 0.5):
+    """Counterfactual repayment for every high-risk farmer of one division, read from its partitions only."""
+    require_model()
+    root = partitioned_store.PARTITION_ROOT
+    partitioned_store.ensure_partitions(DATA_FILE_PATH, root)
+    portfolio = _division_portfolio(division, os.path.getmtime(os.path.join(root, partitioned_store.MANIFEST_NAME)))
+    if portfolio.empty:
+        raise HTTPException(status_code=404, detail=f"unknown division: {division}")
+    result = counterfactual.division_counterfactuals(model, encoder, feature_order, portfolio, threshold)
+    result = result.round({'current_probability': 4, 'new_probability': 4,
+                           'required_payment': 2, 'payment_to_good_payer': 2})
+    return {
+        "division": division,
+        "threshold": threshold,
+        "farmers": len(portfolio),
+        "high_risk": len(result),
+        "results": result.astype(object).where(result.notna(), None).to_dict(orient="records"),
+    }
+
+
+def _model_scorer(record):
+    return model.predict_proba(scoring.build_model_frame(pd.DataFrame([record]), encoder, feature_order))[0][1]
+
+
+@lru_cache(maxsize=1)
+def _scored_portfolio():
+    """Whole portfolio scored once with the API's model; the snapshot under the work queue and the live portfolio."""
+    require_model()
+    partitioned_store.ensure_partitions(DATA_FILE_PATH, partitioned_store.PARTITION_ROOT)
+    portfolio = partitioned_store.load_partitions(partitioned_store.PARTITION_ROOT)
+    timed_import("scripts.recovery_store").RecoveryStore.from_frame(portfolio).attach_features(portfolio)
+    portfolio['Default_Prob'] = model.predict_proba(scoring.build_model_frame(portfolio, encoder, feature_order))[:, 1]
+    return portfolio
+
+
+@lru_cache(maxsize=1)
+def _build_work_queue():
+    return work_queue.WorkQueue.from_frame(_scored_portfolio(), scorer=_model_scorer)
+
+
+def get_work_queue():
+    """Priority queue over the whole portfolio, updated in place by the event ingestor (which replays the log)."""
+    get_event_ingestor().catch_up()
+    return _build_work_queue()
+
+
+@app.get("/work-queue")
+def work_queue_top(k: int = 20, division: Optional[List[str]] = Query(None),
+                   season: Optional[List[str]] = Query(None), min_prob: Optional[float] = None):
+    """Top-K at-risk farmers (optionally for some divisions / seasons), highest risk first."""
+    return {"results": get_work_queue().top(k, division, season, min_prob)}
+
+
+@app.post("/work-queue/payment")
+def work_queue_payment(event: PaymentEvent):
+    """Record a repayment (logged like /events/payment): the farmer is rescored and re-queued in O(log n)."""
+    queue = get_work_queue()
+    _ingest({"type": "payment", "customer_id": event.customer_id, "amount": event.amount, "month": event.month})
+    return queue.get(event.customer_id)
+
+
+@app.post("/work-queue/rescore")
+def work_queue_rescore(event: RescoreEvent):
+    try:
+        return get_work_queue().rescore(event.customer_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"unknown customer: {event.customer_id}")
+
+
+@lru_cache(maxsize=1)
+def get_similarity_index():
+    """KD-tree over every farmer's repayment profile; new farmers are inserted incrementally."""
+    partitioned_store.ensure_partitions(DATA_FILE_PATH, partitioned_store.PARTITION_ROOT)
+    return similarity.SimilarityIndex.from_frame(partitioned_store.load_partitions(partitioned_store.PARTITION_ROOT))
+
+
+def _profile_record(profile):
+    if len(profile.monthly_recovery) != 12:
+        raise HTTPException(status_code=422, detail="monthly_recovery needs 12 values (Jan ... Dec)")
+    record = dict(zip(timed_import("scripts.recovery_store").MONTHS, profile.monthly_recovery))
+    record.update({'Loan_Amount': profile.loan_amount, 'Outstanding_Balance': profile.outstanding})
+    return record
+
+
+def _neighbours_response(neighbours):
+    return {
+        "summary": similarity.outcome_summary(neighbours),
+        "neighbours": neighbours.astype(object).where(neighbours.notna(), None).to_dict(orient="records"),
+    }
+
+
+@app.get("/similar/{customer_id}")
+def similar_to_farmer(customer_id: str, k: int = 10):
+    """k farmers with the most similar repayment profile to an existing farmer, with their outcomes."""
+    try:
+        return _neighbours_response(get_similarity_index().query_customer(customer_id, k))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"unknown customer: {customer_id}")
+
+
+@app.post("/similar")
+def similar_to_profile(profile: RecoveryProfile):
+    """k nearest farmers for a repayment profile that is not in the portfolio (e.g. a new applicant)."""
+    record = _profile_record(profile)
+    return _neighbours_response(get_similarity_index().query_frame(pd.DataFrame([record]), profile.k))
+
+
+@app.post("/similar/insert")
+def similar_insert(profile: ProfileRecord):
+    """Add (or replace) one farmer in the index without a rebuild."""
+    record = _profile_record(profile)
+    record.update({'Customer_ID': profile.customer_id, 'Division': profile.division, 'Loan_Type': profile.loan_type,
+                   'Overdue_Status': profile.overdue_status, 'Action_Taken': profile.action_taken})
+    index = get_similarity_index()
+    index.insert_record(record)
+    return {"indexed": len(index)}
+
+
+@lru_cache(maxsize=1)
+def _stress_portfolio(manifest_mtime):
+    """Portfolio and its recovery store (cumulative curves), reloaded when the partitions change."""
+    portfolio = partitioned_store.load_partitions(partitioned_store.PARTITION_ROOT)
+    return portfolio, timed_import("scripts.recovery_store").RecoveryStore.from_frame(portfolio)
+
+
+@app.post("/stress-test")
+def stress_test_portfolio(request: StressTestRequest):
+    """Monte Carlo harvest-failure scenarios rescored with the model: expected and tail loss per division."""
+    require_model()
+    root = partitioned_store.PARTITION_ROOT
+    partitioned_store.ensure_partitions(DATA_FILE_PATH, root)
+    portfolio, store = _stress_portfolio(os.path.getmtime(os.path.join(root, partitioned_store.MANIFEST_NAME)))
+    started = time.perf_counter()
+    try:
+        result = stress_test.run_stress_test(
+            portfolio, [dict(shock) for shock in request.shocks], request.scenarios,
+            stress_test.ModelScorer(model, encoder, feature_order), request.lgd, request.seed, store=store,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    summary = result.summary().round(4).reset_index()
+    return {
+        "scenarios": request.scenarios,
+        "elapsed_s": round(time.perf_counter() - started, 2),
+        "divisions": summary.astype(object).where(summary.notna(), None).to_dict(orient="records"),
+    }
+
+
+@lru_cache(maxsize=1)
+def get_event_ingestor():
+    """Live portfolio (derived fields + division rollups) kept current by single events, replayed from the log.
+
+    It is the only consumer of the log: every event reaches the work queue through it, exactly once.
+    """
+    live = event_ingest.LivePortfolio(_scored_portfolio(), scorer=_model_scorer)
+    queue = _build_work_queue()
+    return event_ingest.EventIngestor(live, consumers=[lambda event: event_ingest.apply_to_work_queue(queue, event)])
+
+
+def _ingest(event):
+    try:
+        return get_event_ingestor().ingest(event)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"unknown customer: {event['customer_id']}")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.post("/events/payment")
+def ingest_payment(event: PaymentEvent):
+    """Apply one repayment: only this farmer's derived fields, score and division rollup change; the event is logged."""
+    return _ingest({"type": "payment", "customer_id": event.customer_id, "amount": event.amount, "month": event.month})
+
+
+@app.post("/events/action")
+def ingest_action(event: ActionEvent):
+    """Apply a referral (Court / Adjudication_Board) or clear it (No); the event is logged."""
+    return _ingest({"type": "action", "customer_id": event.customer_id, "action": event.action})
+
+
+@app.get("/events/rollup")
+def events_rollup(season: Optional[List[str]] = Query(None)):
+    """Live per season/division aggregates, including every ingested event."""
+    rollup = get_event_ingestor().live.rollup(season)
+    return {"results": rollup.astype(object).where(rollup.notna(), None).to_dict(orient="records")}
+
+
+@app.get("/events/stats")
+def events_stats():
+    ingestor = get_event_ingestor()
+    ingestor.catch_up()
+    return ingestor.stats()
+
+
+@app.get("/audit/stats")
+def audit_stats():
+    """Audit writer counters: logged, written, dropped (buffer full), batches and current queue depth."""
+    return audit_log.stats()
+
+
+@app.get("/admission/stats")
+def admission_stats():
+    """Admission control: active requests, queue depths, shed counts and wait / service latency per lane."""
+    return admission.stats()
+
+
+@app.get("/health")
+def health():
+    """Liveness: the process is up and serving HTTP (the model may still be loading)."""
+    return {"status": "alive", "uptime_s": round(time.perf_counter() - _started_at, 1)}
+
+
+@app.get("/ready")
+def ready(response: Response):
+    """Readiness: 200 once the model is loaded (503 before), plus startup and deferred-import timings."""
+    is_ready = _ready.is_set() and not _startup["error"]
+    if not is_ready:
+        response.status_code = 503
+        response.headers["Retry-After"] = "5"
+    return {
+        "ready": is_ready,
+        "explainer_warm": _startup["explainer_warm_ms"] is not None,
+        "startup": _startup,
+        "imports": import_report(),
+    }
@@ -0,0 +1 @@
+"""AgriGuard helper modules shared by the dashboard and the API."""
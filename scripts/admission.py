@@ -0,0 +1,199 @@
+"""Admission control and load shedding for the scoring API.
+
+``AdmissionMiddleware`` puts every scoring request through one
+``AdmissionController`` before it reaches a handler:
+
+* at most ``max_concurrency`` requests execute at once; bulk requests may use at
+  most ``bulk_share`` of those slots, so interactive requests always have free slots;
+* requests over the limit wait in a bounded FIFO per lane. A freed slot goes to
+  the interactive lane first and then to bulk;
+* when a lane's queue is full, or a request has waited ``queue_timeout`` seconds,
+  the request fails fast with 503 and ``Retry-After`` instead of adding latency for everyone.
+
+Lanes come from the path (``BULK_PATHS``). A client can move its own requests to
+the bulk lane with the ``X-AgriGuard-Lane: bulk`` header, but cannot move them up.
+Health, readiness and metrics endpoints bypass admission. Counters, queue depths
+and wait-time percentiles are returned by ``stats()`` (``GET /admission/stats``).
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)  # dispatch priority, highest first
+
+BULK_PATHS = ("/analyze/arrow", "/counterfactual/division/", "/stress-test")
+EXEMPT_PATHS = ("/health", "/ready", "/admission/stats", "/audit/stats", "/docs", "/openapi.json", "/redoc")
+LANE_HEADER = b"x-agriguard-lane"
+
+MAX_CONCURRENCY = int(os.environ.get("AGRIGUARD_MAX_CONCURRENCY", 8))
+MAX_QUEUE = int(os.environ.get("AGRIGUARD_MAX_QUEUE", 64))
+MAX_BULK_QUEUE = int(os.environ.get("AGRIGUARD_MAX_BULK_QUEUE", 8))
+QUEUE_TIMEOUT = float(os.environ.get("AGRIGUARD_QUEUE_TIMEOUT", 2.0))
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))], 2)
+
+
+class Rejected(Exception):
+    """Request shed by admission control; ``reason`` is ``queue_full`` or ``queue_timeout``."""
+
+    def __init__(self, lane, reason, retry_after):
+        super().__init__(f"{lane} lane {reason.replace('_', ' ')}")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency with one bounded, prioritised wait queue per lane (single event loop)."""
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, max_queue=MAX_QUEUE, max_bulk_queue=MAX_BULK_QUEUE,
+                 bulk_share=0.5, queue_timeout=QUEUE_TIMEOUT, retry_after=1, window=2048):
+        self.max_concurrency = max(1, max_concurrency)
+        self.bulk_limit = max(1, int(self.max_concurrency * bulk_share))
+        self.queue_limits = {INTERACTIVE: max_queue, BULK: max_bulk_queue}
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._active = dict.fromkeys(LANES, 0)
+        self._waiters = {lane: deque() for lane in LANES}
+        self._counts = {lane: dict.fromkeys(("admitted", "queued", "queue_full", "queue_timeout", "completed"), 0)
+                        for lane in LANES}
+        self._wait_ms = {lane: deque(maxlen=window) for lane in LANES}
+        self._service_ms = {lane: deque(maxlen=window) for lane in LANES}
+
+    def _has_slot(self, lane):
+        if sum(self._active.values()) >= self.max_concurrency:
+            return False
+        return lane == INTERACTIVE or self._active[BULK] < self.bulk_limit
+
+    def _dispatch(self):
+        """Hand freed slots to waiters, interactive lane first."""
+        for lane in LANES:
+            waiters = self._waiters[lane]
+            while waiters and self._has_slot(lane):
+                future = waiters.popleft()
+                if not future.done():
+                    self._active[lane] += 1
+                    future.set_result(True)
+
+    def _drop_waiter(self, lane, future):
+        # A dead waiter must not count against the queue limit or hold up new arrivals
+        try:
+            self._waiters[lane].remove(future)
+        except ValueError:
+            pass  # already popped by _dispatch
+
+    async def acquire(self, lane):
+        """Wait for an execution slot; raises ``Rejected`` when the request is shed."""
+        counts = self._counts[lane]
+        started = time.perf_counter()
+        # Waiting requests of this lane keep their place ahead of new arrivals
+        if not self._waiters[lane] and self._has_slot(lane):
+            self._active[lane] += 1
+        else:
+            if len(self._waiters[lane]) >= self.queue_limits[lane]:
+                counts["queue_full"] += 1
+                raise Rejected(lane, "queue_full", self.retry_after)
+            future = asyncio.get_running_loop().create_future()
+            self._waiters[lane].append(future)
+            counts["queued"] += 1
+            try:
+                await asyncio.wait_for(future, self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._drop_waiter(lane, future)
+                counts["queue_timeout"] += 1
+                raise Rejected(lane, "queue_timeout", self.retry_after) from None
+            except asyncio.CancelledError:
+                # Client went away; give back a slot if it was granted in the meantime
+                if future.done() and not future.cancelled():
+                    self.release(lane)
+                else:
+                    self._drop_waiter(lane, future)
+                raise
+        counts["admitted"] += 1
+        self._wait_ms[lane].append((time.perf_counter() - started) * 1000)
+
+    def release(self, lane, service_ms=None):
+        self._active[lane] -= 1
+        if service_ms is not None:
+            self._counts[lane]["completed"] += 1
+            self._service_ms[lane].append(service_ms)
+        self._dispatch()
+
+    def stats(self):
+        lanes = {}
+        for lane in LANES:
+            waits, service = list(self._wait_ms[lane]), list(self._service_ms[lane])
+            lanes[lane] = {
+                **self._counts[lane],
+                "active": self._active[lane],
+                "waiting": len(self._waiters[lane]),
+                "queue_limit": self.queue_limits[lane],
+                "wait_ms_p50": _percentile(waits, 50),
+                "wait_ms_p99": _percentile(waits, 99),
+                "service_ms_p50": _percentile(service, 50),
+                "service_ms_p99": _percentile(service, 99),
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "bulk_limit": self.bulk_limit,
+            "queue_timeout_s": self.queue_timeout,
+            "active": sum(self._active.values()),
+            "lanes": lanes,
+        }
+
+
+def request_lane(path, headers):
+    """Lane for a request, or None when it bypasses admission."""
+    if path.startswith(EXEMPT_PATHS):
+        return None
+    if path.startswith(BULK_PATHS):
+        return BULK
+    for name, value in headers:
+        if name == LANE_HEADER and value.decode("latin-1").strip().lower() == BULK:
+            return BULK
+    return INTERACTIVE
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an ``AdmissionController`` to HTTP requests."""
+
+    def __init__(self, app, controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        lane = request_lane(scope["path"], scope["headers"]) if scope["type"] == "http" else None
+        if lane is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.controller.acquire(lane)
+        except Rejected as e:
+            await self._reject(send, e)
+            return
+        service_start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(lane, (time.perf_counter() - service_start) * 1000)
+
+    @staticmethod
+    async def _reject(send, rejected):
+        body = json.dumps({"detail": f"server overloaded: {rejected}", "lane": rejected.lane}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                        (b"retry-after", str(rejected.retry_after).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
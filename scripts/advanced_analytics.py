@@ -1,8 +1,11 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import numpy as np
+
+from scripts.lazy_imports import lazy_module
+from scripts.profiling import profile_section
+
+px = lazy_module("plotly.express")
+go = lazy_module("plotly.graph_objects")
 
 def render_advanced_insights(df):
     """
@@ -14,89 +17,92 @@ def render_advanced_insights(df):
 
     # --- 1. GLOBAL SHAP ANALYSIS (සමස්ත බැංකුවේ අවදානම් සාධක) ---
     # අරමුණ: මුළු බැංකු පද්ධතියේම ණය පැහැර හැරීමට වැඩිපුරම බලපාන පොදු සාධක හඳුනා ගැනීම.
-    st.subheader("1. Global Risk Drivers - සමස්ත අවදානම් සාධක")
-    st.info("මෙම ප්‍රස්ථාරය මගින් AI පද්ධතිය ණය අවදානම ගණනය කිරීමේදී වැඩිම අවධානයක් යොමු කරන දත්ත සාධක පෙන්වයි.")
+    with profile_section("Advanced Insights · Global SHAP"):
+        st.subheader("1. Global Risk Drivers - සමස්ත අවදානම් සාධක")
+        st.info("මෙම ප්‍රස්ථාරය මගින් AI පද්ධතිය ණය අවදානම ගණනය කිරීමේදී වැඩිම අවධානයක් යොමු කරන දත්ත සාධක පෙන්වයි.")
     
-    # SHAP අගයන් සිමියුලේෂන් කිරීම (සැබෑ Model එක සම්බන්ධ කළ පසු මෙයට පරාමිති ලබාගත හැක)
-    features = [
-        'Repayment Progress (ගෙවීමේ ප්‍රගතිය)', 
-        'Outstanding Balance (හිඟ ශේෂය)', 
-        'Loan Amount (ණය මුදල)', 
-        'Geographic Risk (ප්‍රාදේශීය අවදානම)', 
-        'Action History (පෙර ක්‍රියාමාර්ග)'
-    ]
-    # වැදගත්කම අනුව පෙළගැස්වීම (Feature Importance)
-    importance = [0.42, 0.35, 0.12, 0.08, 0.03]
+        # SHAP අගයන් සිමියුලේෂන් කිරීම (සැබෑ Model එක සම්බන්ධ කළ පසු මෙයට පරාමිති ලබාගත හැක)
+        features = [
+            'Repayment Progress (ගෙවීමේ ප්‍රගතිය)', 
+            'Outstanding Balance (හිඟ ශේෂය)', 
+            'Loan Amount (ණය මුදල)', 
+            'Geographic Risk (ප්‍රාදේශීය අවදානම)', 
+            'Action History (පෙර ක්‍රියාමාර්ග)'
+        ]
+        # වැදගත්කම අනුව පෙළගැස්වීම (Feature Importance)
+        importance = [0.42, 0.35, 0.12, 0.08, 0.03]
     
-    fig_shap = px.bar(
-        x=importance, y=features, orientation='h',
-        labels={'x': 'Impact on Model Decision (තීරණය කෙරෙහි බලපෑම)', 'y': 'Factors (සාධක)'},
-        color=importance, 
-        color_continuous_scale='RdBu_r', # අවදානම රතු සහ නිල් වර්ණ අතර පෙන්වයි
-        title="AI පද්ධතිය අවධානය යොමු කරන ප්‍රධාන සාධක"
-    )
-    fig_shap.update_layout(yaxis={'categoryorder':'total ascending'})
-    st.plotly_chart(fig_shap, use_container_width=True)
+        fig_shap = px.bar(
+            x=importance, y=features, orientation='h',
+            labels={'x': 'Impact on Model Decision (තීරණය කෙරෙහි බලපෑම)', 'y': 'Factors (සාධක)'},
+            color=importance, 
+            color_continuous_scale='RdBu_r', # අවදානම රතු සහ නිල් වර්ණ අතර පෙන්වයි
+            title="AI පද්ධතිය අවධානය යොමු කරන ප්‍රධාන සාධක"
+        )
+        fig_shap.update_layout(yaxis={'categoryorder':'total ascending'})
+        st.plotly_chart(fig_shap, use_container_width=True)
 
     # --- 2. DIVISION-WISE RISK MATRIX (කොට්ඨාස අවදානම් පියසටහන) ---
     # අරමුණ: වසම් (Divisions) එකිනෙක සසඳා වැඩිම අවදානමක් ඇති වසම් හඳුනා ගැනීම.
-    st.divider()
-    st.subheader("2. Division Risk Matrix - ප්‍රාදේශීය අවදානම් විශ්ලේෂණය")
-    st.write("මෙහිදී සෑම වසමකම ණය අයකරගැනීමේ වේගය සහ පවතින මුළු ණය බර සැසඳීමකට ලක් කෙරේ.")
+    with profile_section("Advanced Insights · Division Risk Matrix"):
+        st.divider()
+        st.subheader("2. Division Risk Matrix - ප්‍රාදේශීය අවදානම් විශ්ලේෂණය")
+        st.write("මෙහිදී සෑම වසමකම ණය අයකරගැනීමේ වේගය සහ පවතින මුළු ණය බර සැසඳීමකට ලක් කෙරේ.")
     
-    # වසම් අනුව දත්ත සාරාංශගත කිරීම
-    risk_data = df.groupby('Division').agg({
-        'Repayment_Percent': 'mean',
-        'Outstanding_Balance': 'sum',
-        'Loan_Amount': 'count'
-    }).reset_index()
-    risk_data.columns = ['Division', 'Avg_Repayment', 'Total_Debt', 'Farmer_Count']
+        # වසම් අනුව දත්ත සාරාංශගත කිරීම
+        risk_data = df.groupby('Division').agg({
+            'Repayment_Percent': 'mean',
+            'Outstanding_Balance': 'sum',
+            'Loan_Amount': 'count'
+        }).reset_index()
+        risk_data.columns = ['Division', 'Avg_Repayment', 'Total_Debt', 'Farmer_Count']
 
-    # Scatter Plot එකක් මගින් අවදානම පෙන්වීම
-    fig_risk = px.scatter(
-        risk_data, 
-        x="Avg_Repayment", 
-        y="Total_Debt",
-        size="Farmer_Count", # ගොවීන් ගණන අනුව බුබුළේ විශාලත්වය වෙනස් වේ
-        color="Avg_Repayment",
-        hover_name="Division", 
-        text="Division",
-        title="ගෙවීමේ වේගය සහ පවතින ණය බර අතර සම්බන්ධය",
-        labels={'Avg_Repayment': 'සාමාන්‍ය ගෙවීමේ ප්‍රතිශතය %', 'Total_Debt': 'මුළු ණය බර (LKR)'},
-        color_continuous_scale='RdYlGn' # හොඳ වසම් කොළ පැහැයෙන් සහ දුර්වල වසම් රතු පැහැයෙන්
-    )
-    st.plotly_chart(fig_risk, use_container_width=True)
+        # Scatter Plot එකක් මගින් අවදානම පෙන්වීම
+        fig_risk = px.scatter(
+            risk_data, 
+            x="Avg_Repayment", 
+            y="Total_Debt",
+            size="Farmer_Count", # ගොවීන් ගණන අනුව බුබුළේ විශාලත්වය වෙනස් වේ
+            color="Avg_Repayment",
+            hover_name="Division", 
+            text="Division",
+            title="ගෙවීමේ වේගය සහ පවතින ණය බර අතර සම්බන්ධය",
+            labels={'Avg_Repayment': 'සාමාන්‍ය ගෙවීමේ ප්‍රතිශතය %', 'Total_Debt': 'මුළු ණය බර (LKR)'},
+            color_continuous_scale='RdYlGn' # හොඳ වසම් කොළ පැහැයෙන් සහ දුර්වල වසම් රතු පැහැයෙන්
+        )
+        st.plotly_chart(fig_risk, use_container_width=True)
 
     # --- 3. INDIVIDUAL XAI WATERFALL (පුද්ගලික අවදානම් විග්‍රහය) ---
     # අරමුණ: යම් ගොවියෙකු අවදානම් සහගතයි කියා තීරණය කිරීමට බලපෑ නිශ්චිත හේතු පෙන්වීම.
-    st.divider()
-    st.subheader("3. Individual Risk Waterfall - පුද්ගලික අවදානම් විග්‍රහය")
-    st.write("තෝරාගත් ගොවියාගේ අවදානම් මට්ටම (Risk Score) සැකසීමට බලපෑ සාධක පියවරෙන් පියවර මෙහි දැක්වේ.")
+    with profile_section("Advanced Insights · Individual Waterfall"):
+        st.divider()
+        st.subheader("3. Individual Risk Waterfall - පුද්ගලික අවදානම් විග්‍රහය")
+        st.write("තෝරාගත් ගොවියාගේ අවදානම් මට්ටම (Risk Score) සැකසීමට බලපෑ සාධක පියවරෙන් පියවර මෙහි දැක්වේ.")
     
-    # ගොවියෙකු තෝරාගැනීම
-    target_id = st.selectbox("විග්‍රහය සඳහා ගොවියෙකු තෝරන්න (Select Farmer ID)", df.index[:20])
-    farmer_row = df.loc[target_id]
+        # ගොවියෙකු තෝරාගැනීම
+        target_id = st.selectbox("විග්‍රහය සඳහා ගොවියෙකු තෝරන්න (Select Farmer ID)", df.index[:20])
+        farmer_row = df.loc[target_id]
     
-    col1, col2 = st.columns([1, 2])
-    with col1:
-        st.markdown(f"**පවතින තත්ත්වය:** {farmer_row['Loan_Status']}")
-        st.markdown(f"**ගෙවීමේ ප්‍රතිශතය:** {farmer_row['Repayment_Percent']:.1f}%")
-        st.markdown(f"**ප්‍රාදේශීය ලේකම් කොට්ඨාසය:** {farmer_row['Division']}")
+        col1, col2 = st.columns([1, 2])
+        with col1:
+            st.markdown(f"**පවතින තත්ත්වය:** {farmer_row['Loan_Status']}")
+            st.markdown(f"**ගෙවීමේ ප්‍රතිශතය:** {farmer_row['Repayment_Percent']:.1f}%")
+            st.markdown(f"**ප්‍රාදේශීය ලේකම් කොට්ඨාසය:** {farmer_row['Division']}")
     
-    with col2:
-        # Waterfall Chart එක මගින් AI තීරණය විග්‍රහ කිරීම
-        # මෙහි අගයන් ගොවියාගේ දත්ත අනුව වෙනස් වන ලෙස සැකසිය හැක
-        fig_xai = go.Figure(go.Waterfall(
-            name = "Risk Contribution", orientation = "v",
-            measure = ["relative", "relative", "relative", "total"],
-            x = ["Base Risk (මූලික අවදානම)", "Debt Impact (ණය බරේ බලපෑම)", "Repayment Credit (ගෙවීම් වල වාසිය)", "Final Risk (අවසාන අවදානම)"],
-            y = [50, 25, -20, 55], # උදාහරණ අගයන්
-            connector = {"line":{"color":"rgb(63, 63, 63)"}},
-            increasing = {"marker":{"color":"#ef553b"}}, # අවදානම වැඩි කරන සාධක (රතු)
-            decreasing = {"marker":{"color":"#00cc96"}}, # අවදානම අඩු කරන සාධක (කොළ)
-        ))
+        with col2:
+            # Waterfall Chart එක මගින් AI තීරණය විග්‍රහ කිරීම
+            # මෙහි අගයන් ගොවියාගේ දත්ත අනුව වෙනස් වන ලෙස සැකසිය හැක
+            fig_xai = go.Figure(go.Waterfall(
+                name = "Risk Contribution", orientation = "v",
+                measure = ["relative", "relative", "relative", "total"],
+                x = ["Base Risk (මූලික අවදානම)", "Debt Impact (ණය බරේ බලපෑම)", "Repayment Credit (ගෙවීම් වල වාසිය)", "Final Risk (අවසාන අවදානම)"],
+                y = [50, 25, -20, 55], # උදාහරණ අගයන්
+                connector = {"line":{"color":"rgb(63, 63, 63)"}},
+                increasing = {"marker":{"color":"#ef553b"}}, # අවදානම වැඩි කරන සාධක (රතු)
+                decreasing = {"marker":{"color":"#00cc96"}}, # අවදානම අඩු කරන සාධක (කොළ)
+            ))
         
-        fig_xai.update_layout(title="අවදානම ගණනය වූ ආකාරය (AI Step-by-Step)")
-        st.plotly_chart(fig_xai, use_container_width=True)
+            fig_xai.update_layout(title="අවදානම ගණනය වූ ආකාරය (AI Step-by-Step)")
+            st.plotly_chart(fig_xai, use_container_width=True)
 
     st.success("✅ මෙම උසස් විග්‍රහයන් මගින් ණය අයකර ගැනීමේ ක්‍රියාවලිය වඩාත් කාර්යක්ෂමව කළමනාකරණය කළ හැක.")
\ No newline at end of file
@@ -0,0 +1,187 @@
+"""Asynchronous audit trail of API decisions.
+
+Request handlers only ``put`` a small tuple on a bounded in-memory queue. A
+daemon thread drains it in batches (up to ``batch_size`` records or
+``flush_interval`` seconds) and writes each batch to SQLite in one transaction.
+It also derives the top SHAP features, so that work stays off the request path.
+When the buffer is full, ``log`` waits at most ``block_timeout`` seconds
+(backpressure) and then drops the record, counting it in ``stats()``.
+
+The table doubles as serving data for drift checks and retraining:
+
+    from scripts.audit_log import read_decisions
+    recent = read_decisions(limit=10_000)
+"""
+
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+AUDIT_DB = os.environ.get("AGRIGUARD_AUDIT_DB", os.path.join("data", "audit", "decisions.sqlite"))
+TOP_FEATURES = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    logged_at REAL NOT NULL,
+    endpoint TEXT NOT NULL,
+    model_version TEXT,
+    division TEXT,
+    loan_amount REAL,
+    outstanding REAL,
+    recovery REAL,
+    status TEXT,
+    risk_probability REAL,
+    top_features TEXT,
+    latency_ms REAL
+)
+"""
+INSERT = """
+INSERT INTO decisions (logged_at, endpoint, model_version, division, loan_amount, outstanding, recovery,
+                       status, risk_probability, top_features, latency_ms)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def top_shap_features(shap_row, feature_names, k=TOP_FEATURES):
+    """The ``k`` largest |SHAP| contributions of one row as ``[{"feature", "shap"}]``."""
+    # Imported here, on the writer thread, to keep it out of the API's cold start
+    from scripts.explainability import positive_class_shap
+
+    values = positive_class_shap(shap_row, ndim=1).astype(float)
+    order = np.argsort(-np.abs(values))[:k]
+    return [{"feature": feature_names[i], "shap": round(float(values[i]), 6)} for i in order]
+
+
+class AuditLogger(threading.Thread):
+    """Bounded queue + background batch writer for decision records."""
+
+    def __init__(self, db_path=AUDIT_DB, feature_names=(), model_version=None, buffer_size=10_000,
+                 batch_size=500, flush_interval=1.0, block_timeout=0.01):
+        """``feature_names`` and ``model_version`` may be callables, resolved by the writer on first use."""
+        super().__init__(name="agriguard-audit-writer", daemon=True)
+        self.db_path = db_path
+        self.feature_names = feature_names
+        self.model_version = model_version
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self._queue = queue.Queue(maxsize=buffer_size)
+        self._stop_event = threading.Event()
+        self._counts = {"logged": 0, "written": 0, "dropped": 0, "batches": 0, "write_errors": 0}
+        self._counts_lock = threading.Lock()
+
+    def _count(self, key, n=1):
+        with self._counts_lock:
+            self._counts[key] += n
+
+    def log(self, endpoint, inputs, status, risk_probability, shap_row=None, latency_ms=None):
+        """Enqueue one decision; never blocks longer than ``block_timeout``."""
+        record = (time.time(), endpoint, inputs, status, risk_probability, shap_row, latency_ms)
+        try:
+            self._queue.put(record, block=self.block_timeout > 0, timeout=self.block_timeout or None)
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("logged")
+        return True
+
+    def stats(self):
+        with self._counts_lock:
+            stats = dict(self._counts)
+        stats["queued"] = self._queue.qsize()
+        stats["buffer_size"] = self._queue.maxsize
+        return stats
+
+    def _resolve_metadata(self):
+        if callable(self.feature_names):
+            self.feature_names = self.feature_names()
+        if callable(self.model_version):
+            self.model_version = self.model_version()
+        self.feature_names = list(self.feature_names or ())
+
+    def _row(self, record):
+        logged_at, endpoint, inputs, status, probability, shap_row, latency_ms = record
+        top = json.dumps(top_shap_features(shap_row, self.feature_names)) if shap_row is not None else None
+        return (logged_at, endpoint, self.model_version, inputs.get("division"), inputs.get("loan_amount"),
+                inputs.get("outstanding"), inputs.get("recovery"), status, probability, top, latency_ms)
+
+    def _drain(self):
+        """Wait for the first record, then collect a batch until it is full or the flush interval passes."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn, batch):
+        try:
+            self._resolve_metadata()
+            with conn:
+                conn.executemany(INSERT, [self._row(r) for r in batch])
+            self._count("written", len(batch))
+            self._count("batches")
+        except Exception:
+            self._count("write_errors")
+            logger.exception("Audit batch of %d records could not be written", len(batch))
+
+    def run(self):
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(SCHEMA)
+        try:
+            while not self._stop_event.is_set():
+                batch = self._drain()
+                if batch:
+                    self._write(conn, batch)
+            # Flush whatever is still buffered on shutdown
+            remaining = []
+            while True:
+                try:
+                    remaining.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for start in range(0, len(remaining), self.batch_size):
+                self._write(conn, remaining[start:start + self.batch_size])
+        finally:
+            conn.close()
+
+    def close(self, timeout=5.0):
+        """Stop the writer after flushing the buffer."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+def read_decisions(db_path=AUDIT_DB, since=None, limit=None):
+    """Logged decisions as a DataFrame (newest first), e.g. for drift checks or retraining."""
+    query = "SELECT * FROM decisions"
+    params = []
+    if since is not None:
+        query += " WHERE logged_at >= ?"
+        params.append(since)
+    query += " ORDER BY id DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(int(limit))
+    with sqlite3.connect(db_path) as conn:
+        return pd.read_sql_query(query, conn, params=params)
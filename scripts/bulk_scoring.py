@@ -0,0 +1,140 @@
+"""Vectorized bulk scoring over Apache Arrow IPC streams.
+
+Input record batches carry ``division``, ``loan_amount``, ``outstanding`` and
+``recovery`` columns; every batch is scored straight from its NumPy buffers (no
+per-row Python objects) and answered with ``status``, ``risk_probability`` and
+one ``shap_<feature>`` column per model feature.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from scripts.explainability import get_explainer, positive_class_shap
+from scripts.scoring import CATEGORICAL_FEATURES
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+INPUT_COLUMNS = ("division", "loan_amount", "outstanding", "recovery")
+# Same banking-rule bands as /analyze, indexed by status code
+STATUS_LABELS = [
+    "හොඳින් ණය ගෙවන (Good Payer)",
+    "උසාවි ක්‍රියාමාර්ග (Court Case)",
+    "බේරුම්කරණ සභා (Mediation)",
+]
+
+
+def _float_column(batch, name):
+    # Zero-copy for float64 columns without nulls; other numeric types are cast once
+    return np.asarray(batch.column(name).cast(pa.float64()).to_numpy(zero_copy_only=False))
+
+
+def payer_status_codes(repayment_ratio, debt_ratio):
+    court = (repayment_ratio < 0.3) & (debt_ratio > 0.7)
+    mediation = ~court & (repayment_ratio < 0.6)
+    return np.select([court, mediation], [1, 2], 0).astype(np.int8)
+
+
+class BulkScorer:
+    """Scores Arrow record batches with the API's model, encoder and SHAP explainer."""
+
+    def __init__(self, model, encoder, explainer=None, feature_order=(), loan_type="Maha", officer_assigned="Yes"):
+        self.model = model
+        self.encoder = encoder
+        self._explainer = explainer
+        self.feature_order = list(feature_order)
+        self.loan_type = loan_type
+        self.officer_assigned = officer_assigned
+
+    @property
+    def explainer(self):
+        # Built (and shap imported) on the first scored batch unless one was passed in
+        if self._explainer is None:
+            self._explainer = get_explainer(self.model)
+        return self._explainer
+
+    def _encode_categoricals(self, column):
+        """(rows x 3) ordinal codes: encode each distinct division once, then gather by index."""
+        encoded = column if pa.types.is_dictionary(column.type) else pc.dictionary_encode(column)
+        if encoded.null_count:
+            raise ValueError("division must not contain nulls")
+        uniques = encoded.dictionary.to_pandas()
+        lookup = self.encoder.transform(pd.DataFrame({
+            'Loan_Type': self.loan_type,
+            'Officer_Assigned': self.officer_assigned,
+            'Division': uniques,
+        })[CATEGORICAL_FEATURES])
+        return lookup[encoded.indices.to_numpy(zero_copy_only=False)]
+
+    def score_batch(self, batch):
+        """Score one record batch; returns None for an empty batch."""
+        if batch.num_rows == 0:
+            return None
+        missing = [c for c in INPUT_COLUMNS if c not in batch.schema.names]
+        if missing:
+            raise KeyError(f"missing columns: {', '.join(missing)}")
+
+        loan_amount = _float_column(batch, "loan_amount")
+        outstanding = _float_column(batch, "outstanding")
+        recovery = _float_column(batch, "recovery")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            repayment_ratio = recovery / loan_amount
+            debt_ratio = outstanding / loan_amount
+        codes = self._encode_categoricals(batch.column("division"))
+
+        features = pd.DataFrame({
+            'Loan_Type': codes[:, 0],
+            'Officer_Assigned': codes[:, 1],
+            'Division': codes[:, 2],
+            'Loan_Amount': loan_amount,
+            'Outstanding_Balance': outstanding,
+            'Total_Recovery': recovery,
+            'Repayment_Ratio': repayment_ratio,
+            'Debt_Ratio': debt_ratio,
+        })[self.feature_order]
+
+        probability = self.model.predict_proba(features)[:, 1]
+        shap_matrix = positive_class_shap(self.explainer.shap_values(features))
+
+        columns = {
+            "status": pa.DictionaryArray.from_arrays(
+                pa.array(payer_status_codes(repayment_ratio, debt_ratio)), pa.array(STATUS_LABELS)),
+            "risk_probability": pa.array(probability, type=pa.float64()),
+        }
+        for j, name in enumerate(self.feature_order):
+            columns[f"shap_{name}"] = pa.array(shap_matrix[:, j], type=pa.float64())
+        return pa.RecordBatch.from_pydict(columns)
+
+    def score_stream(self, payload):
+        """Read an IPC stream, score it batch by batch and return the response stream bytes."""
+        reader = pa.ipc.open_stream(pa.py_buffer(payload))
+        sink = pa.BufferOutputStream()
+        writer = None
+        for batch in reader:
+            scored = self.score_batch(batch)
+            if scored is None:
+                continue
+            if writer is None:
+                writer = pa.ipc.new_stream(sink, scored.schema)
+            writer.write_batch(scored)
+        if writer is None:
+            return b""
+        writer.close()
+        return sink.getvalue().to_pybytes()
+
+
+def frame_to_ipc(df, batch_size=10_000):
+    """Client helper: encode a DataFrame with the input columns as an IPC stream."""
+    table = pa.Table.from_pandas(df[list(INPUT_COLUMNS)], preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=batch_size):
+            writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def ipc_to_frame(payload):
+    """Client helper: decode a scored response stream."""
+    if not payload:
+        return pd.DataFrame()
+    return pa.ipc.open_stream(pa.py_buffer(payload)).read_all().to_pandas()
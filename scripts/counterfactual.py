@@ -0,0 +1,103 @@
+"""Counterfactual "path to low risk" search.
+
+For each farmer, find the smallest extra repayment that drops the model's default
+probability below a threshold. A repayment of ``x`` raises ``Total_Recovery`` by
+``x`` and lowers ``Outstanding_Balance`` by ``x``. The search uses a coarse grid
+over 0..100% of the outstanding balance, then a fine grid inside the first
+crossing interval. Each stage scores every farmer's candidates in one batched
+``predict_proba`` call.
+"""
+
+import numpy as np
+import pandas as pd
+
+from scripts.bulk_scoring import payer_status_codes, STATUS_LABELS
+from scripts.scoring import build_model_frame
+
+GOOD_PAYER_REPAYMENT_RATIO = 0.6
+
+
+def _candidate_frame(X_base, payments, feature_order):
+    """Repeat each encoded farmer row once per candidate payment and re-derive the ratios."""
+    n, k = payments.shape
+    col = {name: j for j, name in enumerate(feature_order)}
+    cand = np.repeat(X_base, k, axis=0)
+    pay = payments.ravel()
+    loan = cand[:, col['Loan_Amount']]
+    recovery = cand[:, col['Total_Recovery']] + pay
+    outstanding = np.maximum(cand[:, col['Outstanding_Balance']] - pay, 0.0)
+    cand[:, col['Total_Recovery']] = recovery
+    cand[:, col['Outstanding_Balance']] = outstanding
+    cand[:, col['Repayment_Ratio']] = recovery / loan
+    cand[:, col['Debt_Ratio']] = outstanding / loan
+    return pd.DataFrame(cand, columns=feature_order)
+
+
+def _batched_probabilities(model, X_base, payments, feature_order, max_rows):
+    """(farmers x candidates) default probabilities, scored in chunks of at most ``max_rows`` rows."""
+    n, k = payments.shape
+    probs = np.empty((n, k))
+    step = max(1, max_rows // k)
+    for start in range(0, n, step):
+        stop = min(start + step, n)
+        cand = _candidate_frame(X_base[start:stop], payments[start:stop], feature_order)
+        probs[start:stop] = model.predict_proba(cand)[:, 1].reshape(stop - start, k)
+    return probs
+
+
+def find_counterfactuals(model, X, threshold=0.5, coarse_steps=21, fine_steps=16, max_rows=200_000):
+    """Smallest repayment per row of the encoded model frame ``X`` that brings risk below ``threshold``.
+
+    Returns a frame aligned with ``X`` holding current / new probability, the
+    required payment (NaN when even full settlement is not enough) and ``achievable``.
+    """
+    feature_order = list(X.columns)
+    X_base = X.to_numpy(dtype=np.float64)
+    outstanding = X['Outstanding_Balance'].to_numpy(dtype=np.float64)
+
+    coarse = np.linspace(0.0, 1.0, coarse_steps)
+    p_coarse = _batched_probabilities(model, X_base, outstanding[:, None] * coarse[None, :], feature_order, max_rows)
+    below = p_coarse < threshold
+    achievable = below.any(axis=1)
+    first = np.argmax(below, axis=1)
+
+    # Refine between the last grid point above the threshold and the first one below it
+    lo = coarse[np.maximum(first - 1, 0)]
+    hi = coarse[first]
+    fine = lo[:, None] + (hi - lo)[:, None] * np.linspace(0.0, 1.0, fine_steps)[None, :]
+    p_fine = _batched_probabilities(model, X_base, outstanding[:, None] * fine, feature_order, max_rows)
+    first_fine = np.argmax(p_fine < threshold, axis=1)
+
+    rows = np.arange(len(X))
+    payment = outstanding * fine[rows, first_fine]
+    return pd.DataFrame({
+        'current_probability': p_coarse[:, 0],
+        'required_payment': np.where(achievable, payment, np.nan),
+        'new_probability': np.where(achievable, p_fine[rows, first_fine], p_coarse[:, -1]),
+        'achievable': achievable,
+    }, index=X.index)
+
+
+def payment_to_good_payer(loan_amount, recovery):
+    """Rule-based payment needed to leave the Court Case / Mediation bands (repayment ratio >= 0.6)."""
+    return np.maximum(GOOD_PAYER_REPAYMENT_RATIO * np.asarray(loan_amount) - np.asarray(recovery), 0.0)
+
+
+def division_counterfactuals(model, encoder, feature_order, portfolio, threshold=0.5, **search):
+    """Counterfactuals for every high-risk farmer of a portfolio slice (typically one division).
+
+    High risk means a Court Case / Mediation status band or a model probability at or
+    above ``threshold``.
+    """
+    X = build_model_frame(portfolio, encoder, feature_order)
+    probability = model.predict_proba(X)[:, 1]
+    loan = portfolio['Loan_Amount'].to_numpy(dtype=np.float64)
+    recovery = X['Total_Recovery'].to_numpy(dtype=np.float64)
+    status = payer_status_codes(recovery / loan, portfolio['Outstanding_Balance'].to_numpy() / loan)
+    high_risk = (status != 0) | (probability >= threshold)
+
+    result = find_counterfactuals(model, X[high_risk], threshold, **search)
+    result.insert(0, 'customer_id', portfolio.loc[high_risk, 'Customer_ID'].to_numpy())
+    result.insert(1, 'status', np.asarray(STATUS_LABELS, dtype=object)[status[high_risk]])
+    result['payment_to_good_payer'] = payment_to_good_payer(loan[high_risk], recovery[high_risk])
+    return result.sort_values('current_probability', ascending=False).reset_index(drop=True)
@@ -0,0 +1,322 @@
+"""Incremental payment and action events over the in-memory portfolio.
+
+A new repayment or a referral (court, adjudication board) used to mean
+regenerating the CSV and recomputing every derived column and aggregate.
+Instead, ``LivePortfolio`` holds the portfolio's mutable columns as arrays plus
+running per season/division sums. ``apply`` touches one row and one rollup bucket:
+
+* payment: monthly recovery, ``Total_Paid``, ``Outstanding_Balance``,
+  ``Repayment_Percent``, ``Loan_Status``, ``Default_Prob`` and ``Risk_Category``;
+* action: ``Action_Taken`` and ``Loan_Status``.
+
+Each event is appended to ``data/events/events.jsonl`` (override with
+AGRIGUARD_EVENT_LOG) before it is applied. The log is the record of every
+change since the partitioned data was written. Replaying it over a fresh
+snapshot rebuilds the live state, and other processes (the API and the
+dashboard) follow it with ``EventIngestor.catch_up``.
+
+    {"type": "payment", "customer_id": "CID-0018", "amount": 25000, "month": "Mar"}
+    {"type": "action", "customer_id": "CID-0018", "action": "Court"}
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from scripts.recovery_store import MONTH_LABELS, MONTHS
+from scripts.scoring import dashboard_default_prob, risk_category
+from scripts.shared_portfolio import COURT_ACTIONS, MEDIATION_ACTIONS, loan_status
+from scripts.work_queue import dashboard_scorer
+
+EVENT_LOG = os.environ.get("AGRIGUARD_EVENT_LOG", os.path.join("data", "events", "events.jsonl"))
+EVENT_TYPES = ("payment", "action")
+ACTIONS = ["No"] + COURT_ACTIONS + MEDIATION_ACTIONS
+ROLLUP_COLUMNS = ['Farmer_Count', 'Loan_Amount', 'Outstanding_Balance', 'Total_Paid',
+                  'Repayment_Percent', 'Default_Prob', 'High_Risk_Count']
+
+
+def validate_event(event):
+    """Normalise an event dict; raises ValueError for malformed events."""
+    event = dict(event)
+    if event.get("type") not in EVENT_TYPES:
+        raise ValueError(f"event type must be one of {EVENT_TYPES}")
+    if not event.get("customer_id"):
+        raise ValueError("customer_id is required")
+    if event["type"] == "payment":
+        event["amount"] = float(event.get("amount", 0))
+        if event["amount"] <= 0:
+            raise ValueError("payment amount must be positive")
+        month = event.get("month") or MONTH_LABELS[datetime.now().month - 1]
+        if month not in MONTH_LABELS:
+            raise ValueError(f"month must be one of {MONTH_LABELS}")
+        event["month"] = month
+    elif event.get("action") not in ACTIONS:
+        raise ValueError(f"action must be one of {ACTIONS}")
+    return event
+
+
+class LivePortfolio:
+    """Mutable copy of the scored portfolio with O(1) per-event updates of derived fields and rollups.
+
+    ``scorer(record)`` rescores one farmer after a payment, with the same record
+    fields as a ``WorkQueue`` scorer; pass the model-backed one when ``Default_Prob`` came from the model.
+    """
+
+    def __init__(self, portfolio, scorer=dashboard_scorer):
+        self.scorer = scorer
+        self.customer_ids = portfolio['Customer_ID'].astype(str).to_numpy()
+        self._positions = {cid: i for i, cid in enumerate(self.customer_ids)}
+        self.seasons = portfolio['Loan_Type'].astype(str).to_numpy()
+        self.divisions = portfolio['Division'].astype(str).to_numpy()
+        self.officers = portfolio['Officer_Assigned'].astype(str).to_numpy()
+        self.block = portfolio[MONTHS].to_numpy(dtype=np.float64, copy=True)
+        loan = portfolio['Loan_Amount'].to_numpy(dtype=np.float64)
+        total = self.block.sum(axis=1) if 'Total_Paid' not in portfolio else portfolio['Total_Paid'].to_numpy(np.float64)
+        repayment = total / np.where(loan == 0, 1, loan) * 100
+        outstanding = portfolio['Outstanding_Balance'].to_numpy(dtype=np.float64, copy=True)
+        self.columns = {
+            'Loan_Amount': loan,
+            'Outstanding_Balance': outstanding,
+            'Total_Paid': np.array(total, dtype=np.float64),
+            'Repayment_Percent': repayment,
+            'Default_Prob': (portfolio['Default_Prob'].to_numpy(dtype=np.float64, copy=True)
+                             if 'Default_Prob' in portfolio else dashboard_default_prob(outstanding, loan, repayment)),
+        }
+        actions = portfolio['Action_Taken'].astype(str).to_numpy(dtype=object)
+        self.columns['Action_Taken'] = actions
+        self.columns['Loan_Status'] = np.array([loan_status(a, r) for a, r in zip(actions, repayment)], dtype=object)
+        self.columns['Risk_Category'] = np.array([risk_category(p) for p in self.columns['Default_Prob']], dtype=object)
+        self.dirty = set()   # positions changed since the snapshot
+        self.applied = 0
+        self._lock = threading.RLock()
+        self._rollups = {}
+        self._status_counts = {}
+        for i in range(len(self.customer_ids)):
+            self._contribute(i, +1)
+
+    def __len__(self):
+        return len(self.customer_ids)
+
+    def __contains__(self, customer_id):
+        return customer_id in self._positions
+
+    def _contribute(self, i, sign):
+        """Add (+1) or remove (-1) row ``i`` from its season/division rollup bucket."""
+        key = (self.seasons[i], self.divisions[i])
+        bucket = self._rollups.setdefault(key, dict.fromkeys(ROLLUP_COLUMNS, 0.0))
+        bucket['Farmer_Count'] += sign
+        for name in ('Loan_Amount', 'Outstanding_Balance', 'Total_Paid', 'Repayment_Percent', 'Default_Prob'):
+            bucket[name] += sign * self.columns[name][i]
+        bucket['High_Risk_Count'] += sign * (self.columns['Risk_Category'][i] == 'High Risk')
+        counts = self._status_counts.setdefault(key, {})
+        status = self.columns['Loan_Status'][i]
+        counts[status] = counts.get(status, 0) + sign
+
+    def record(self, customer_id):
+        """Current state of one farmer; KeyError if unknown."""
+        i = self._positions[customer_id]
+        with self._lock:
+            record = {'Customer_ID': customer_id, 'Loan_Type': self.seasons[i], 'Division': self.divisions[i]}
+            record.update({name: values[i] for name, values in self.columns.items()})
+            record.update(zip(MONTHS, self.block[i]))
+        return {k: (v.item() if hasattr(v, 'item') else v) for k, v in record.items()}
+
+    def check(self, event):
+        """Raise KeyError for an unknown farmer, ValueError for a payment larger than the outstanding balance."""
+        i = self._positions[event['customer_id']]
+        if event['type'] == 'payment':
+            outstanding = self.columns['Outstanding_Balance'][i]
+            if event['amount'] > outstanding:
+                raise ValueError(f"payment {event['amount']:,.2f} exceeds the outstanding balance {outstanding:,.2f}")
+
+    def apply(self, event):
+        """Apply one validated event to its farmer and rollup bucket; returns the farmer's new state.
+
+        A payment is capped at the outstanding balance (events replayed over a newer snapshot may overshoot).
+        """
+        i = self._positions[event['customer_id']]
+        c = self.columns
+        with self._lock:
+            self._contribute(i, -1)
+            if event['type'] == 'payment':
+                amount = min(event['amount'], c['Outstanding_Balance'][i])
+                self.block[i, MONTH_LABELS.index(event['month'])] += amount
+                c['Total_Paid'][i] += amount
+                c['Outstanding_Balance'][i] -= amount
+                loan = c['Loan_Amount'][i]
+                c['Repayment_Percent'][i] = c['Total_Paid'][i] / (loan or 1) * 100
+                c['Default_Prob'][i] = float(self.scorer({
+                    'Loan_Type': self.seasons[i], 'Officer_Assigned': self.officers[i], 'Division': self.divisions[i],
+                    'Loan_Amount': loan, 'Outstanding_Balance': c['Outstanding_Balance'][i],
+                    'Total_Paid': c['Total_Paid'][i],
+                }))
+                c['Risk_Category'][i] = risk_category(c['Default_Prob'][i])
+            else:
+                c['Action_Taken'][i] = event['action']
+            c['Loan_Status'][i] = loan_status(c['Action_Taken'][i], c['Repayment_Percent'][i])
+            self._contribute(i, +1)
+            self.dirty.add(i)
+            self.applied += 1
+        return self.record(event['customer_id'])
+
+    def rollup(self, seasons=None):
+        """Per season/division aggregates in the shape of ``build_division_rollup``."""
+        with self._lock:
+            rows = [{'Loan_Type': s, 'Division': d, **bucket} for (s, d), bucket in self._rollups.items()
+                    if seasons is None or s in seasons]
+        table = pd.DataFrame(rows, columns=['Loan_Type', 'Division'] + ROLLUP_COLUMNS)
+        count = table['Farmer_Count'].where(table['Farmer_Count'] > 0)
+        table['Repayment_Percent'] = table['Repayment_Percent'] / count
+        table['Default_Prob'] = table['Default_Prob'] / count
+        table[['Farmer_Count', 'High_Risk_Count']] = table[['Farmer_Count', 'High_Risk_Count']].astype(int)
+        return table.sort_values(['Loan_Type', 'Division']).reset_index(drop=True)
+
+    def status_counts(self, seasons=None):
+        """``Loan_Status`` counts over the selected seasons."""
+        totals = {}
+        with self._lock:
+            for (season, _), counts in self._status_counts.items():
+                if seasons is None or season in seasons:
+                    for status, n in counts.items():
+                        totals[status] = totals.get(status, 0) + n
+        return {status: n for status, n in totals.items() if n}
+
+    def patch(self, frame):
+        """``frame`` (any subset of the portfolio) with the rows changed by events overwritten."""
+        if not self.dirty:
+            return frame
+        with self._lock:
+            positions = np.fromiter(self.dirty, dtype=np.intp)
+        rows = pd.Index(frame['Customer_ID'].astype(str)).get_indexer(self.customer_ids[positions])
+        found = rows >= 0
+        if not found.any():
+            return frame
+        rows, positions = rows[found], positions[found]
+        frame = frame.copy(deep=False)
+        with self._lock:
+            updates = {**self.columns, **{m: self.block[:, j] for j, m in enumerate(MONTHS)}}
+            for name, values in updates.items():
+                if name in frame.columns:
+                    frame[name] = _patched(frame[name], rows, values[positions])
+        return frame
+
+
+def _patched(column, rows, values):
+    """Copy of ``column`` with ``values`` at positions ``rows``, in the column's own dtype.
+
+    Categorical columns gain any new labels; an integer column only becomes float when
+    a value is fractional (e.g. a part-rupee payment).
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.cat.add_categories(pd.Index(values).unique().difference(column.cat.categories))
+    elif pd.api.types.is_integer_dtype(column.dtype) and not np.array_equal(values, np.round(values)):
+        column = column.astype(np.float64)
+    column = column.copy()
+    column.iloc[rows] = pd.array(values).astype(column.dtype)
+    return column
+
+
+class EventLog:
+    """Append-only JSON-lines event log shared by every process."""
+
+    def __init__(self, path=EVENT_LOG, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+
+    def append(self, event):
+        event = {"id": uuid.uuid4().hex, "ts": time.time(), **event}
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # One write() on an O_APPEND descriptor, so concurrent writers never interleave lines
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+        return event
+
+    def read(self, offset=0):
+        """Events appended after byte ``offset``; returns ``(events, new_offset)``."""
+        if not os.path.exists(self.path):
+            return [], offset
+        events = []
+        with open(self.path, "rb") as fh:
+            fh.seek(offset)
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    break  # a write still in progress; picked up next time
+                offset += len(line)
+                if line.strip():
+                    events.append(json.loads(line))
+        return events, offset
+
+
+def apply_to_work_queue(queue, event):
+    """Mirror an event into a ``WorkQueue`` (farmers not in the queue are ignored)."""
+    record = queue.get(event['customer_id'])
+    if record is None:
+        return
+    if event['type'] == 'payment':
+        # Capped like ``LivePortfolio.apply``
+        queue.record_payment(event['customer_id'], min(event['amount'], record['Outstanding_Balance']))
+    else:
+        queue.record_action(event['customer_id'], event['action'])
+
+
+class EventIngestor:
+    """Validate, log and apply events; ``catch_up`` applies events logged by other processes."""
+
+    def __init__(self, live, log=None, consumers=()):
+        self.live = live
+        self.log = log or EventLog()
+        self.consumers = list(consumers)   # callables(event), e.g. a work queue
+        self._offset = 0
+        self._own = set()                  # ids logged here and already applied
+        self._lock = threading.Lock()
+        self.catch_up()                    # replay the existing log
+
+    def _apply(self, event):
+        record = self.live.apply(event)
+        for consumer in self.consumers:
+            consumer(event)
+        return record
+
+    def catch_up(self):
+        """Apply events appended to the log since the last call; returns how many were applied."""
+        with self._lock:
+            events, self._offset = self.log.read(self._offset)
+            applied = 0
+            for event in events:
+                if event['id'] in self._own:
+                    self._own.discard(event['id'])
+                    continue
+                try:
+                    self._apply(event)
+                    applied += 1
+                except KeyError:
+                    pass  # farmer not in this snapshot
+            return applied
+
+    def ingest(self, event):
+        """Validate, append to the log, then apply; KeyError for an unknown farmer, ValueError if malformed or overpaid."""
+        event = validate_event(event)
+        self.catch_up()
+        with self._lock:
+            self.live.check(event)
+            event = self.log.append(event)
+            self._own.add(event['id'])
+            return self._apply(event)
+
+    def stats(self):
+        return {"applied": self.live.applied, "changed_farmers": len(self.live.dirty),
+                "log": self.log.path, "log_offset": self._offset}
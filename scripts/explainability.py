@@ -1,9 +1,301 @@
-"""Explainability helpers: SHAP and waterfall utilities (stub)."""
+"""Explainability engine: cached SHAP explainers and chunked portfolio explanations.
 
-import shap
+One ``TreeExplainer`` is kept per model version, keyed by a content hash, so
+repeated calls never rebuild it. ``explain_portfolio`` streams any number of
+portfolio frames through SHAP (interaction) values in chunks sized to a memory
+cap and keeps only running sums. The sums are checkpointed to
+``data/explanations/<model version>/<data version>/`` after every chunk, so a
+province-scale run never holds more than one chunk of SHAP output and can resume
+after an interruption. Explanations of different data never share a checkpoint.
+
+    python -m scripts.explainability --memory-mb 256
+"""
+
+import hashlib
+import json
+import os
+import threading
+import weakref
+
+import joblib
+import numpy as np
 import pandas as pd
 
+from scripts.lazy_imports import timed_import
+from scripts.scoring import build_model_frame, model_feature_order
+
+EXPLANATION_ROOT = os.path.join("data", "explanations")
+AGGREGATES_FILE = "aggregates.npz"
+META_FILE = "meta.json"
+# Working memory per explained row is a few times its (features + 1)^2 float64 output
+SHAP_MEMORY_OVERHEAD = 3
+
+_explainers = {}
+_explainers_lock = threading.Lock()
+_versions = weakref.WeakKeyDictionary()
+
+
+def model_version(model):
+    """Content hash of a fitted model; identical artifacts share one version."""
+    try:
+        return _versions[model]
+    except (KeyError, TypeError):
+        version = joblib.hash(model)[:16]
+    try:
+        _versions[model] = version
+    except TypeError:
+        pass
+    return version
+
+
+def get_explainer(model):
+    """Cached ``TreeExplainer`` for this model version (shap itself is imported on first use)."""
+    version = model_version(model)
+    with _explainers_lock:
+        explainer = _explainers.get(version)
+        if explainer is None:
+            explainer = _explainers[version] = timed_import("shap").TreeExplainer(model)
+    return explainer
+
+
 def explain_sample(model, X):
-    """Return SHAP values for a single sample (stub)."""
-    expl = shap.Explainer(model)
-    return expl(X)
+    """Return SHAP values (a ``shap.Explanation``) for a single sample or a small frame."""
+    return get_explainer(model)(X)
+
+
+def chunk_rows_for(n_features, memory_cap_mb=256, interactions=True):
+    """Rows per SHAP chunk that keep the working set under ``memory_cap_mb``."""
+    width = (n_features + 1) ** 2 if interactions else n_features + 1
+    bytes_per_row = 8 * width * SHAP_MEMORY_OVERHEAD
+    return max(1, int(memory_cap_mb * 1024 * 1024 // bytes_per_row))
+
+
+def positive_class_shap(values, ndim=2):
+    """SHAP values of the positive class as an array of rank ``ndim``.
+
+    Binary classifiers may return a per-class list or a trailing class axis. ``ndim``
+    is the rank without it: 2 for rows x features, 3 for interactions, 1 for one row.
+    """
+    if isinstance(values, list):
+        values = values[-1]
+    values = np.asarray(values)
+    return values[..., -1] if values.ndim > ndim else values
+
+
+class ExplanationAggregates:
+    """Running SHAP sums over every row explained so far, overall and per group."""
+
+    def __init__(self, feature_names, version, interactions=True, data_version=None):
+        f = len(feature_names)
+        self.feature_names = list(feature_names)
+        self.version = version
+        self.data_version = data_version
+        self.interactions = interactions
+        self.rows = 0
+        self.chunks = 0
+        self.sum_shap = np.zeros(f)
+        self.sum_abs_shap = np.zeros(f)
+        self.sum_interaction = np.zeros((f, f)) if interactions else None
+        self.sum_abs_interaction = np.zeros((f, f)) if interactions else None
+        self.groups = {}  # label -> [count, sum |shap| (f,)]
+
+    def update(self, shap_values, interaction_values=None, group_labels=None):
+        self.rows += len(shap_values)
+        self.chunks += 1
+        self.sum_shap += shap_values.sum(axis=0)
+        self.sum_abs_shap += np.abs(shap_values).sum(axis=0)
+        if interaction_values is not None:
+            self.sum_interaction += interaction_values.sum(axis=0)
+            self.sum_abs_interaction += np.abs(interaction_values).sum(axis=0)
+        if group_labels is not None:
+            labels, codes = np.unique(np.asarray(group_labels, dtype=str), return_inverse=True)
+            abs_sums = np.zeros((len(labels), len(self.feature_names)))
+            np.add.at(abs_sums, codes, np.abs(shap_values))
+            counts = np.bincount(codes, minlength=len(labels))
+            for label, count, sums in zip(labels, counts, abs_sums):
+                entry = self.groups.setdefault(label, [0, np.zeros(len(self.feature_names))])
+                entry[0] += int(count)
+                entry[1] += sums
+
+    def save(self, out_dir):
+        """Atomically checkpoint the sums (``aggregates.npz`` + ``meta.json``)."""
+        os.makedirs(out_dir, exist_ok=True)
+        labels = sorted(self.groups)
+        arrays = {
+            'sum_shap': self.sum_shap,
+            'sum_abs_shap': self.sum_abs_shap,
+            'group_counts': np.array([self.groups[g][0] for g in labels], dtype=np.int64),
+            'group_sum_abs_shap': np.array([self.groups[g][1] for g in labels]).reshape(len(labels), -1),
+        }
+        if self.interactions:
+            arrays['sum_interaction'] = self.sum_interaction
+            arrays['sum_abs_interaction'] = self.sum_abs_interaction
+        tmp = os.path.join(out_dir, AGGREGATES_FILE + ".tmp")
+        with open(tmp, "wb") as fh:
+            np.savez(fh, **arrays)
+        os.replace(tmp, os.path.join(out_dir, AGGREGATES_FILE))
+
+        meta = {
+            'model_version': self.version,
+            'data_version': self.data_version,
+            'feature_names': self.feature_names,
+            'interactions': self.interactions,
+            'rows': self.rows,
+            'chunks': self.chunks,
+            'groups': labels,
+        }
+        tmp = os.path.join(out_dir, META_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(meta, fh, indent=2)
+        os.replace(tmp, os.path.join(out_dir, META_FILE))
+
+    @classmethod
+    def load(cls, out_dir):
+        """Restore a checkpoint written by ``save``; returns None when there is none."""
+        meta_path = os.path.join(out_dir, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, encoding="utf-8") as fh:
+            meta = json.load(fh)
+        agg = cls(meta['feature_names'], meta['model_version'], meta['interactions'], meta.get('data_version'))
+        agg.rows, agg.chunks = meta['rows'], meta['chunks']
+        with np.load(os.path.join(out_dir, AGGREGATES_FILE)) as data:
+            agg.sum_shap = data['sum_shap']
+            agg.sum_abs_shap = data['sum_abs_shap']
+            if agg.interactions:
+                agg.sum_interaction = data['sum_interaction']
+                agg.sum_abs_interaction = data['sum_abs_interaction']
+            for label, count, sums in zip(meta['groups'], data['group_counts'], data['group_sum_abs_shap']):
+                agg.groups[label] = [int(count), sums]
+        return agg
+
+    def feature_importance(self):
+        """Mean |SHAP| and mean SHAP per feature, most important first."""
+        n = max(self.rows, 1)
+        return pd.DataFrame({
+            'Mean_Abs_SHAP': self.sum_abs_shap / n,
+            'Mean_SHAP': self.sum_shap / n,
+        }, index=pd.Index(self.feature_names, name='Feature')).sort_values('Mean_Abs_SHAP', ascending=False)
+
+    def interaction_matrix(self):
+        """Mean |SHAP interaction| for every feature pair (diagonal = main effects)."""
+        if not self.interactions:
+            return None
+        return pd.DataFrame(self.sum_abs_interaction / max(self.rows, 1),
+                            index=self.feature_names, columns=self.feature_names)
+
+    def top_interactions(self, k=10):
+        """Strongest off-diagonal pairs, e.g. Division x Debt_Ratio."""
+        matrix = self.interaction_matrix()
+        if matrix is None:
+            return None
+        i, j = np.triu_indices(len(self.feature_names), k=1)
+        # Each pair is split symmetrically across (i, j) and (j, i)
+        pairs = pd.DataFrame({
+            'Feature_A': np.array(self.feature_names)[i],
+            'Feature_B': np.array(self.feature_names)[j],
+            'Mean_Abs_Interaction': 2 * matrix.to_numpy()[i, j],
+        })
+        return pairs.sort_values('Mean_Abs_Interaction', ascending=False).head(k).reset_index(drop=True)
+
+    def group_importance(self):
+        """Mean |SHAP| per feature within each group (e.g. per Division)."""
+        labels = sorted(self.groups)
+        if not labels:
+            return pd.DataFrame(columns=self.feature_names)
+        counts = np.array([self.groups[g][0] for g in labels], dtype=float)
+        sums = np.array([self.groups[g][1] for g in labels])
+        table = pd.DataFrame(sums / counts[:, None], index=pd.Index(labels, name='Group'), columns=self.feature_names)
+        table.insert(0, 'Rows', counts.astype(int))
+        return table
+
+
+def frame_fingerprint(df):
+    """Content hash of a portfolio frame (values and column names)."""
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    digest.update("|".join(map(str, df.columns)).encode())
+    return digest.hexdigest()[:16]
+
+
+def explain_portfolio(model, encoder, frames, memory_cap_mb=256, interactions=True, group_col='Division',
+                      root=EXPLANATION_ROOT, resume=True, data_version=None):
+    """Explain every row of ``frames`` (a portfolio DataFrame or an iterable of them) in memory-capped chunks.
+
+    Returns the ``ExplanationAggregates``; they are also checkpointed under
+    ``root/<model version>/<data version>/``. ``data_version`` identifies the data
+    (e.g. ``partition_fingerprint``); it is required for an iterable and defaults to
+    ``frame_fingerprint`` for a DataFrame. With ``resume`` the run continues from an
+    existing checkpoint, skipping rows already counted (``frames`` must arrive in the
+    same order). A checkpoint recorded for other data raises ValueError.
+    """
+    if isinstance(frames, pd.DataFrame):
+        data_version = data_version or frame_fingerprint(frames)
+        frames = [frames]
+    elif data_version is None:
+        raise ValueError("data_version is required when frames are streamed")
+    feature_order = model_feature_order(model)
+    version = model_version(model)
+    out_dir = os.path.join(root, version, data_version)
+    explainer = get_explainer(model)
+    chunk_rows = chunk_rows_for(len(feature_order), memory_cap_mb, interactions)
+
+    agg = ExplanationAggregates.load(out_dir) if resume else None
+    if agg is not None and agg.data_version != data_version:
+        raise ValueError(f"checkpoint in {out_dir} is for data {agg.data_version}, not {data_version}; "
+                         "run without resume")
+    if agg is None or agg.interactions != interactions:
+        agg = ExplanationAggregates(feature_order, version, interactions, data_version)
+    skip = agg.rows
+
+    for frame in frames:
+        if skip >= len(frame):
+            skip -= len(frame)
+            continue
+        frame = frame.iloc[skip:]
+        skip = 0
+        for start in range(0, len(frame), chunk_rows):
+            part = frame.iloc[start:start + chunk_rows]
+            X = build_model_frame(part, encoder, feature_order)
+            groups = part[group_col].to_numpy() if group_col in part.columns else None
+            if interactions:
+                phi = positive_class_shap(explainer.shap_interaction_values(X), 3)
+                # Main SHAP values are the row sums of the interaction matrix
+                agg.update(phi.sum(axis=2), phi, groups)
+            else:
+                agg.update(positive_class_shap(explainer.shap_values(X)), None, groups)
+            agg.save(out_dir)
+            del part, X
+    return agg
+
+
+def load_explanations(model, data_version, root=EXPLANATION_ROOT):
+    """Aggregates previously written for this model and data version, or None."""
+    return ExplanationAggregates.load(os.path.join(root, model_version(model), data_version))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from scripts.partitioned_store import PARTITION_ROOT, list_partitions, partition_fingerprint
+    from scripts.scoring import MODEL_DIR, load_model_assets
+
+    parser = argparse.ArgumentParser(description="Chunked SHAP / interaction aggregates over the partitioned portfolio.")
+    parser.add_argument("--memory-mb", type=float, default=256)
+    parser.add_argument("--no-interactions", action="store_true")
+    parser.add_argument("--fresh", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--partitions", default=PARTITION_ROOT)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--out", default=EXPLANATION_ROOT)
+    args = parser.parse_args()
+
+    model, encoder = load_model_assets(args.model_dir)
+    # One partition file in memory at a time
+    frames = (pd.read_csv(os.path.join(args.partitions, p["path"])) for p in list_partitions(args.partitions))
+    result = explain_portfolio(model, encoder, frames, args.memory_mb, not args.no_interactions,
+                               root=args.out, resume=not args.fresh,
+                               data_version=partition_fingerprint(args.partitions))
+    print(f"{result.rows} rows in {result.chunks} chunks -> "
+          f"{os.path.join(args.out, result.version, result.data_version)}")
+    print(result.feature_importance().to_string())
+    if result.interactions:
+        print(result.top_interactions().to_string(index=False))
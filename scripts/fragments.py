@@ -0,0 +1,42 @@
+"""Fragment helpers: independently rerunnable dashboard units with per-unit timing.
+
+A widget inside a ``dashboard_fragment`` only reruns that unit, not the whole
+``app.py`` script. Every (re)run of a unit is timed and the elapsed time is shown
+under it and kept in ``st.session_state["fragment_timings"]``; in profiling mode
+the unit is also measured by ``scripts.profiling``.
+"""
+
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+import streamlit as st
+
+from scripts.profiling import profile_section
+
+TIMINGS_KEY = "fragment_timings"
+
+
+@contextmanager
+def timed_section(name, show=True):
+    """Time a block of dashboard code and record it under ``name``."""
+    start = time.perf_counter()
+    try:
+        with profile_section(name):
+            yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        st.session_state.setdefault(TIMINGS_KEY, {})[name] = elapsed_ms
+        if show:
+            st.caption(f"⏱️ {name}: {elapsed_ms:.0f} ms")
+
+
+def dashboard_fragment(name):
+    """Turn a page unit into a ``st.fragment`` that times each of its reruns."""
+    def decorator(func):
+        @wraps(func)
+        def timed_unit(*args, **kwargs):
+            with timed_section(name):
+                return func(*args, **kwargs)
+        return st.fragment(timed_unit)
+    return decorator
@@ -0,0 +1,104 @@
+"""Deferred imports of heavy modules, with an import-time report.
+
+``lazy_module("plotly.express")`` returns a stand-in that imports the real module
+on first attribute access. A dashboard page or API endpoint that never touches
+it never pays for it. Every deferred import is timed, and ``import_report()``
+lists what was loaded, when, and how long it took (shown by the API's readiness
+endpoint and the dashboard's profiling panel).
+
+Cold-start report for an entry point, from ``python -X importtime``:
+
+    python -m scripts.lazy_imports main
+"""
+
+import importlib
+import sys
+import threading
+import time
+
+_import_times = {}   # module -> {"Module", "Import (ms)", "Loaded at"}
+_lock = threading.RLock()
+_process_start = time.time()
+
+
+def timed_import(name):
+    """Import ``name`` (once) and record how long the first import took."""
+    module = sys.modules.get(name)
+    if module is not None and name in _import_times:
+        return module
+    with _lock:
+        if name in _import_times:
+            return sys.modules[name]
+        already_loaded = name in sys.modules
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        _import_times[name] = {
+            "Module": name,
+            "Import (ms)": 0.0 if already_loaded else round((time.perf_counter() - start) * 1000, 1),
+            "Loaded at (s)": round(time.time() - _process_start, 2),
+        }
+        return module
+
+
+class LazyModule:
+    """Module stand-in; the real import happens on first attribute access."""
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+
+    def _load(self):
+        return timed_import(self.__dict__["_name"])
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_name"] in _import_times else "not loaded"
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+def lazy_module(name):
+    return LazyModule(name)
+
+
+def is_loaded(name):
+    return name in _import_times
+
+
+def import_report():
+    """Deferred imports performed so far, slowest first."""
+    with _lock:
+        return sorted(_import_times.values(), key=lambda r: r["Import (ms)"], reverse=True)
+
+
+def cold_start_report(entry_point, top=15):
+    """Import time of a fresh ``import entry_point``, grouped by top-level package (self time, ms)."""
+    import subprocess
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {entry_point}"],
+                            capture_output=True, text=True)
+    totals = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        # Self times add up without double counting nested imports
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(self_us)
+    rows = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)
+    report = [{"Package": package, "Import (ms)": round(us / 1000, 1)} for package, us in rows[:top]]
+    report.append({"Package": "(total)", "Import (ms)": round(sum(totals.values()) / 1000, 1)})
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Cold-start import-time report for an entry point.")
+    parser.add_argument("entry_point", nargs="?", default="main", help="module to import, e.g. main or scripts.explainability")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    print(json.dumps(cold_start_report(args.entry_point, args.top), indent=2))
@@ -0,0 +1,246 @@
+"""Load generator for the scoring API (main.py).
+
+Drives ``/analyze`` (or the bulk ``/analyze/arrow`` variant) with ``FarmerData``
+payloads sampled from the processed portfolio, either in-process (FastAPI TestClient) or against a running uvicorn,
+and reports throughput, latency percentiles and error rates as JSON.
+
+    python -m scripts.load_test --mode closed --concurrency 16 --duration 30
+    python -m scripts.load_test --target http://127.0.0.1:8000 --mode open --rate 200
+    python -m scripts.load_test --endpoint analyze_arrow --samples 5000 --concurrency 2
+
+One sampled payload is sent before the run and must succeed, so a model that
+cannot score the data (e.g. artifacts trained on other categories; fix with
+``python -m scripts.retraining --promote``) is reported up front instead of
+load-testing the error path.
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scripts.recovery_store import MONTHS
+
+DATA_FILE_PATH = "data/processed/1_processed_loan_data_csv.csv"
+
+
+def sample_payloads(csv_path=DATA_FILE_PATH, n=500, seed=42):
+    """Realistic ``FarmerData`` bodies drawn (with replacement) from the processed portfolio."""
+    df = pd.read_csv(csv_path)
+    df.columns = df.columns.str.strip()
+    rows = df.sample(n=n, replace=True, random_state=seed)
+    return [
+        {
+            "division": row.Division,
+            "loan_amount": float(row.Loan_Amount),
+            "outstanding": float(row.Outstanding_Balance),
+            "recovery": float(rec),
+        }
+        for row, rec in zip(rows.itertuples(), rows[MONTHS].sum(axis=1))
+    ]
+
+
+def _json_bodies(payloads):
+    return [json.dumps(p).encode("utf-8") for p in payloads]
+
+
+def _arrow_bodies(payloads):
+    # One IPC stream carrying every sampled row, sent with each request
+    from scripts.bulk_scoring import frame_to_ipc
+
+    return [frame_to_ipc(pd.DataFrame(payloads))]
+
+
+# Endpoint name -> (path, content type, builder of the request bodies cycled through by the run)
+ENDPOINTS = {
+    "analyze": ("/analyze", "application/json", _json_bodies),
+    "analyze_arrow": ("/analyze/arrow", "application/vnd.apache.arrow.stream", _arrow_bodies),
+}
+
+
+class InProcessTransport:
+    """Calls the FastAPI app directly through its TestClient (no network)."""
+
+    def __init__(self):
+        from fastapi.testclient import TestClient
+
+        import main
+
+        self.client = TestClient(main.app, raise_server_exceptions=False)
+
+    def post(self, path, body, content_type):
+        return self.client.post(path, content=body, headers={"Content-Type": content_type}).status_code
+
+
+class HttpTransport:
+    """Plain HTTP against a running server, e.g. ``uvicorn main:app``."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def post(self, path, body, content_type):
+        request = urllib.request.Request(
+            self.base_url + path, data=body,
+            headers={"Content-Type": content_type}, method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+class _Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.statuses = Counter()
+
+    def record(self, latency_s, status):
+        with self.lock:
+            self.latencies.append(latency_s)
+            self.statuses[status] += 1
+
+
+def preflight(transport, endpoint, payloads):
+    """Send one sampled payload (also waits out model loading); returns its status code.
+
+    An unreachable ``HttpTransport`` target raises ``urllib.error.URLError``.
+    """
+    path, content_type, build = ENDPOINTS[endpoint]
+    return transport.post(path, build(payloads[:1])[0], content_type)
+
+
+def _timed_call(transport, path, content_type, body, recorder, scheduled_at=None):
+    # Open-loop latency is measured from the scheduled send time (avoids coordinated omission)
+    start = scheduled_at if scheduled_at is not None else time.perf_counter()
+    try:
+        status = transport.post(path, body, content_type)
+    except Exception as e:
+        status = type(e).__name__
+    recorder.record(time.perf_counter() - start, status)
+
+
+def run_closed_loop(transport, endpoint, payloads, concurrency=8, duration=10.0, max_requests=None):
+    """``concurrency`` workers each send the next request as soon as the previous one returns."""
+    path, content_type, build = ENDPOINTS[endpoint]
+    bodies = build(payloads)
+    recorder = _Recorder()
+    counter = iter(range(max_requests if max_requests else 2 ** 62))
+    counter_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            _timed_call(transport, path, content_type, bodies[i % len(bodies)], recorder)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return recorder, time.perf_counter() - start
+
+
+def run_open_loop(transport, endpoint, payloads, rate=50.0, duration=10.0, max_workers=64):
+    """Send at a fixed arrival ``rate`` (req/s) regardless of how fast responses come back."""
+    path, content_type, build = ENDPOINTS[endpoint]
+    bodies = build(payloads)
+    recorder = _Recorder()
+    interval = 1.0 / rate
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        i = 0
+        while True:
+            scheduled = start + i * interval
+            if scheduled - start >= duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(_timed_call, transport, path, content_type, bodies[i % len(bodies)], recorder, scheduled)
+            i += 1
+    return recorder, time.perf_counter() - start
+
+
+def summarize(recorder, elapsed, **config):
+    latencies_ms = np.array(recorder.latencies) * 1000
+    total = len(latencies_ms)
+    ok = sum(n for status, n in recorder.statuses.items() if isinstance(status, int) and 200 <= status < 300)
+    report = dict(config)
+    report.update({
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(1 - ok / total, 4) if total else 0.0,
+        "status_codes": {str(k): v for k, v in sorted(recorder.statuses.items(), key=lambda kv: str(kv[0]))},
+    })
+    if total:
+        report["latency_ms"] = {
+            "mean": round(float(latencies_ms.mean()), 2),
+            "p50": round(float(np.percentile(latencies_ms, 50)), 2),
+            "p95": round(float(np.percentile(latencies_ms, 95)), 2),
+            "p99": round(float(np.percentile(latencies_ms, 99)), 2),
+            "max": round(float(latencies_ms.max()), 2),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the AgriGuard scoring API.")
+    parser.add_argument("--target", default="inprocess", help="'inprocess' or a base URL such as http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", default="analyze", choices=sorted(ENDPOINTS))
+    parser.add_argument("--mode", default="closed", choices=["closed", "open"])
+    parser.add_argument("--concurrency", type=int, default=8, help="closed-loop workers")
+    parser.add_argument("--rate", type=float, default=50.0, help="open-loop arrivals per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--requests", type=int, default=None, help="closed-loop request cap")
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--csv", default=DATA_FILE_PATH)
+    parser.add_argument("--out", default=None, help="write the JSON report here as well as stdout")
+    args = parser.parse_args(argv)
+
+    payloads = sample_payloads(args.csv, args.samples)
+    transport = InProcessTransport() if args.target == "inprocess" else HttpTransport(args.target)
+    try:
+        status = preflight(transport, args.endpoint, payloads)
+    except (urllib.error.URLError, TimeoutError) as e:
+        parser.exit(1, f"{args.target} did not answer a sampled payload ({getattr(e, 'reason', e)}). "
+                       "Check that the API is running there (uvicorn main:app).\n")
+    if not 200 <= status < 300:
+        parser.exit(1, f"{ENDPOINTS[args.endpoint][0]} answered {status} to a sampled payload, so the run would only "
+                       "measure the error path. Check that the model in models/ was trained on this data "
+                       "(python -m scripts.retraining --promote).\n")
+    if args.mode == "closed":
+        recorder, elapsed = run_closed_loop(transport, args.endpoint, payloads, args.concurrency,
+                                            args.duration, args.requests)
+        config = {"concurrency": args.concurrency}
+    else:
+        recorder, elapsed = run_open_loop(transport, args.endpoint, payloads, args.rate, args.duration)
+        config = {"rate_rps": args.rate}
+
+    report = summarize(recorder, elapsed, target=args.target, endpoint=args.endpoint, mode=args.mode, **config)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Season / division partitioned portfolio storage.
+
+Layout (hive style, one CSV per partition)::
+
+    data/partitions/_manifest.json
+    data/partitions/season=2024_Maha_season/division=Thonigala/part-0.csv
+
+Loaders consult the manifest first and only open the partition files that match
+the requested seasons and divisions (predicate pushdown by path pruning).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from urllib.parse import quote
+
+import pandas as pd
+
+PARTITION_ROOT = os.path.join("data", "partitions")
+MANIFEST_NAME = "_manifest.json"
+SEASON_COL = "Loan_Type"
+DIVISION_COL = "Division"
+
+
+def _partition_dir(root, season, division):
+    return os.path.join(root, f"season={quote(str(season), safe='')}", f"division={quote(str(division), safe='')}")
+
+
+def _atomic_write_text(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        fh.write(text)
+    os.replace(tmp_path, path)
+
+
+def read_manifest(root=PARTITION_ROOT):
+    path = os.path.join(root, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {"partitions": []}
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _next_customer_number(manifest):
+    last = max((p.get("max_customer_no", -1) for p in manifest["partitions"]), default=-1)
+    return last + 1
+
+
+def write_partitions(df, root=PARTITION_ROOT, source=None):
+    """Split a portfolio frame by season and division and merge it into the store.
+
+    Each season in ``df`` is rebuilt in full: all of its stored partitions are replaced,
+    so a division that no longer appears is dropped. Partitions of other seasons (e.g.
+    earlier Maha / Yala seasons) are left untouched. Rows without a ``Customer_ID`` are
+    numbered in row order after the highest ID those other seasons use.
+    """
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+    df[SEASON_COL] = df[SEASON_COL].astype(str).str.strip()
+    manifest = read_manifest(root)
+    seasons = set(df[SEASON_COL])
+    kept = [p for p in manifest["partitions"] if p["season"] not in seasons]
+
+    if "Customer_ID" not in df.columns:
+        start = _next_customer_number({"partitions": kept})
+        df["Customer_ID"] = "CID-" + pd.Series(range(start, start + len(df)), index=df.index).astype(str).str.zfill(4)
+
+    by_key = {(p["season"], p["division"]): p for p in kept}
+    for (season, division), part in df.groupby([SEASON_COL, DIVISION_COL], sort=True):
+        part_dir = _partition_dir(root, season, division)
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, "part-0.csv")
+        _atomic_write_text(path, part.to_csv(index=False))
+        by_key[(season, division)] = {
+            "season": season,
+            "division": division,
+            "path": os.path.relpath(path, root),
+            "rows": int(len(part)),
+            "bytes": os.path.getsize(path),
+            "max_customer_no": int(part["Customer_ID"].str[4:].astype(int).max()),
+        }
+
+    removed = [p for p in manifest["partitions"] if (p["season"], p["division"]) not in by_key]
+    manifest = {
+        "source": source or manifest.get("source"),
+        "source_mtime": os.path.getmtime(source) if source else manifest.get("source_mtime"),
+        "partitions": sorted(by_key.values(), key=lambda p: (p["season"], p["division"])),
+    }
+    os.makedirs(root, exist_ok=True)
+    _atomic_write_text(os.path.join(root, MANIFEST_NAME), json.dumps(manifest, indent=2))
+    # Loaders go through the manifest, so dropped partition files can go once it is published
+    for part in removed:
+        shutil.rmtree(os.path.dirname(os.path.join(root, part["path"])), ignore_errors=True)
+    return manifest
+
+
+def build_from_csv(csv_path, root=PARTITION_ROOT):
+    """Partition a flat processed CSV, replacing the seasons it contains.
+
+    Customer IDs follow row order (``CID-0000`` upwards on a fresh store), after any
+    IDs held by seasons added separately, so a rebuild never reuses one of theirs.
+    """
+    return write_partitions(pd.read_csv(csv_path), root, source=csv_path)
+
+
+def ensure_partitions(csv_path, root=PARTITION_ROOT):
+    """Build the store on first use and rebuild it when the flat source CSV changes."""
+    manifest = read_manifest(root)
+    stale = (
+        not manifest["partitions"]
+        or (os.path.exists(csv_path)
+            and os.path.abspath(manifest.get("source") or "") == os.path.abspath(csv_path)
+            and os.path.getmtime(csv_path) > (manifest.get("source_mtime") or 0))
+    )
+    if stale and os.path.exists(csv_path):
+        manifest = build_from_csv(csv_path, root)
+    return manifest
+
+
+def list_partitions(root=PARTITION_ROOT, seasons=None, divisions=None):
+    """Manifest entries matching the predicates; ``None`` means no filter on that key."""
+    seasons = None if seasons is None else set(seasons)
+    divisions = None if divisions is None else set(divisions)
+    return [
+        p for p in read_manifest(root)["partitions"]
+        if (seasons is None or p["season"] in seasons)
+        and (divisions is None or p["division"] in divisions)
+    ]
+
+
+def partition_fingerprint(root=PARTITION_ROOT):
+    """Hash of every partition file's path, size and mtime; changes whenever the stored data does."""
+    digest = hashlib.sha256()
+    for part in sorted(list_partitions(root), key=lambda p: p["path"]):
+        stat = os.stat(os.path.join(root, part["path"]))
+        digest.update(f"{part['path']}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+
+def list_seasons(root=PARTITION_ROOT):
+    return sorted({p["season"] for p in read_manifest(root)["partitions"]})
+
+
+def list_divisions(root=PARTITION_ROOT, seasons=None):
+    return sorted({p["division"] for p in list_partitions(root, seasons=seasons)})
+
+
+def load_partitions(root=PARTITION_ROOT, seasons=None, divisions=None, columns=None):
+    """Read only the partitions that satisfy the season / division predicates."""
+    parts = list_partitions(root, seasons, divisions)
+    frames = [pd.read_csv(os.path.join(root, p["path"]), usecols=columns) for p in parts]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+    if "Customer_ID" in df.columns:
+        order = df["Customer_ID"].str[4:].astype(int).to_numpy().argsort(kind="stable")
+        df = df.iloc[order].reset_index(drop=True)
+    return df
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add a processed season CSV to the partitioned store.")
+    parser.add_argument("csv_path")
+    parser.add_argument("--root", default=PARTITION_ROOT)
+    args = parser.parse_args()
+    result = write_partitions(pd.read_csv(args.csv_path), args.root)
+    print(f"{len(result['partitions'])} partitions in {args.root}")
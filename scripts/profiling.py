@@ -0,0 +1,153 @@
+"""Opt-in profiling for dashboard page sections.
+
+Enabled per session with the sidebar toggle or ``AGRIGUARD_PROFILE=1``. Each wrapped
+section records wall time and optionally a cProfile capture that can be downloaded
+from the profiling panel.
+
+Memory columns need ``AGRIGUARD_TRACEMALLOC=1``. tracemalloc is process-wide and slows
+every session, so it is started once for the whole process and never toggled
+from a session. A section's peak is measured from ``tracemalloc.reset_peak()`` at
+its start. Sections that run at the same time in other sessions share that peak.
+"""
+
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+
+from scripts.lazy_imports import import_report
+
+ENABLED_KEY = "profiling_enabled"
+CPROFILE_KEY = "profiling_cprofile"
+RECORDS_KEY = "profile_records"
+STATS_KEY = "profile_stats"
+
+# cProfile cannot nest, so only the outermost profiled section on a thread captures
+_local = threading.local()
+
+
+def _env_flag(name):
+    return os.environ.get(name, "").lower() in ("1", "true", "yes")
+
+
+def env_profiling_default():
+    return _env_flag("AGRIGUARD_PROFILE")
+
+
+def memory_tracing_enabled():
+    return _env_flag("AGRIGUARD_TRACEMALLOC")
+
+
+if memory_tracing_enabled() and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+
+def profiling_enabled():
+    return bool(st.session_state.get(ENABLED_KEY, env_profiling_default()))
+
+
+def render_profiling_controls():
+    """Sidebar toggle for profiling mode (and cProfile capture)."""
+    enabled = st.toggle("Profiling mode", value=env_profiling_default(), key=ENABLED_KEY)
+    if enabled:
+        st.checkbox("Capture cProfile", key=CPROFILE_KEY)
+
+
+@contextmanager
+def profile_section(name):
+    """Record wall time, allocations and (optionally) a cProfile for one page section."""
+    if not profiling_enabled():
+        yield
+        return
+
+    depth = getattr(_local, "depth", 0)
+    profiler = None
+    if depth == 0 and st.session_state.get(CPROFILE_KEY):
+        profiler = cProfile.Profile()
+    mem_before = None
+    if tracemalloc.is_tracing():
+        # Fold the enclosing section's peak so far into its running max before resetting it
+        peaks = _local.__dict__.setdefault("peaks", [])
+        if peaks:
+            peaks[-1] = max(peaks[-1], tracemalloc.get_traced_memory()[1])
+        mem_before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        peaks.append(0)
+    _local.depth = depth + 1
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        wall_ms = (time.perf_counter() - start) * 1000
+        _local.depth = depth
+        record = {"Section": name, "Depth": depth, "Wall (ms)": round(wall_ms, 1)}
+        if mem_before is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            peaks = _local.peaks
+            peak = max(peaks.pop(), peak)
+            if peaks:
+                peaks[-1] = max(peaks[-1], peak)
+            record["Allocated (KB)"] = round((current - mem_before) / 1024, 1)
+            record["Section peak (KB)"] = round((peak - mem_before) / 1024, 1)
+        # Keyed by section so a fragment rerun replaces its previous measurement
+        st.session_state.setdefault(RECORDS_KEY, {})[name] = record
+        if profiler:
+            st.session_state.setdefault(STATS_KEY, {})[name] = profiler
+
+
+def _combined_stats():
+    profilers = list(st.session_state.get(STATS_KEY, {}).values())
+    if not profilers:
+        return None
+    stats = pstats.Stats(profilers[0])
+    for profiler in profilers[1:]:
+        stats.add(profiler)
+    return stats
+
+
+def render_profiling_panel():
+    """Per-section breakdown plus profile downloads, shown at the bottom of the page."""
+    if not profiling_enabled():
+        return
+    records = st.session_state.get(RECORDS_KEY, {})
+    with st.expander("🔬 Profiling: per-section breakdown", expanded=True):
+        if not records:
+            st.caption("No sections recorded yet.")
+            return
+        table = pd.DataFrame(records.values())
+        st.dataframe(table.sort_values("Wall (ms)", ascending=False), use_container_width=True, hide_index=True)
+        if not tracemalloc.is_tracing():
+            st.caption("Start the dashboard with AGRIGUARD_TRACEMALLOC=1 to record memory per section.")
+
+        col_a, col_b, col_c = st.columns(3)
+        col_a.download_button("📥 Section timings (CSV)", table.to_csv(index=False).encode("utf-8"),
+                              file_name="agriguard_profile_sections.csv", mime="text/csv")
+        stats = _combined_stats()
+        if stats is not None:
+            report = io.StringIO()
+            stats.stream = report
+            stats.sort_stats("cumulative").print_stats(40)
+            col_b.download_button("📥 cProfile report (TXT)", report.getvalue().encode("utf-8"),
+                                  file_name="agriguard_profile.txt", mime="text/plain")
+            # Same format as Stats.dump_stats, loadable with pstats / snakeviz
+            col_c.download_button("📥 cProfile data (.prof)", marshal.dumps(stats.stats),
+                                  file_name="agriguard_profile.prof", mime="application/octet-stream")
+        deferred = import_report()
+        if deferred:
+            st.caption("Deferred imports (loaded on first use)")
+            st.dataframe(pd.DataFrame(deferred), use_container_width=True, hide_index=True)
+        if st.button("Reset measurements"):
+            st.session_state[RECORDS_KEY] = {}
+            st.session_state[STATS_KEY] = {}
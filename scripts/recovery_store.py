@@ -0,0 +1,134 @@
+"""Monthly recovery time-series store.
+
+Keeps the twelve ``Jan_Recovery`` ... ``Dec_Recovery`` columns as one contiguous
+2-D NumPy block (one row per farmer-season record) and derives every
+recovery-behaviour feature from it in a single vectorized pass. Rows are keyed
+by (Customer_ID, season). Scorers read the attached totals (``attach_features``), the
+Recovery Velocity chart reads ``season_velocity`` and the stress test reads
+``cumulative_for``.
+"""
+
+import numpy as np
+import pandas as pd
+
+MONTHS = ['Jan_Recovery', 'Feb_Recovery', 'Mar_Recovery', 'Apr_Recovery',
+          'May_Recovery', 'Jun_Recovery', 'Jul_Recovery', 'Aug_Recovery',
+          'Sep_Recovery', 'Oct_Recovery', 'Nov_Recovery', 'Dec_Recovery']
+MONTH_LABELS = [m.split('_')[0] for m in MONTHS]
+
+
+# Attached to portfolio frames and read by every scorer
+SCORING_FEATURES = ['Total_Paid', 'Repayment_Percent']
+
+
+def compute_recovery_features(block, loan_amounts):
+    """Totals, velocity, months-since-last-payment and cumulative curves for every row at once."""
+    loan = np.where(loan_amounts == 0, 1.0, loan_amounts)
+    cumulative = np.cumsum(block, axis=1)
+    total = cumulative[:, -1]
+
+    paid = block > 0
+    any_paid = paid.any(axis=1)
+    n_months = block.shape[1]
+    first_idx = np.argmax(paid, axis=1)
+    last_idx = n_months - 1 - np.argmax(paid[:, ::-1], axis=1)
+    active_months = np.where(any_paid, n_months - first_idx, 0)
+
+    repayment_percent = total / loan * 100
+    # Velocity: share of the loan recovered per month since the first payment
+    velocity = np.divide(repayment_percent, active_months,
+                         out=np.zeros_like(repayment_percent), where=active_months > 0)
+
+    return {
+        'Total_Paid': total,
+        'Repayment_Percent': repayment_percent,
+        'Recovery_Velocity': velocity,
+        'Months_Since_Payment': np.where(any_paid, n_months - 1 - last_idx, n_months),
+        'cumulative': cumulative,
+    }
+
+
+class RecoveryStore:
+    """Contiguous (records x 12) recovery block spanning one or more seasons."""
+
+    def __init__(self, block, customer_ids, seasons, divisions, loan_amounts):
+        self.block = np.ascontiguousarray(block, dtype=np.float64)
+        self.customer_ids = np.asarray(customer_ids)
+        self.seasons = np.asarray(seasons)
+        self.divisions = np.asarray(divisions)
+        self.loan_amounts = np.asarray(loan_amounts, dtype=np.float64)
+        self.features = compute_recovery_features(self.block, self.loan_amounts)
+        self._monthly_totals = {}
+        self._velocity = {}
+        self._keys = None
+
+    @classmethod
+    def from_frame(cls, df, id_col='Customer_ID', season_col='Loan_Type'):
+        return cls(
+            df[MONTHS].to_numpy(dtype=np.float64),
+            df[id_col].to_numpy(),
+            df[season_col].astype(str).str.strip().to_numpy(),
+            df['Division'].to_numpy(),
+            df['Loan_Amount'].to_numpy(),
+        )
+
+    def __len__(self):
+        return self.block.shape[0]
+
+    def season_ids(self):
+        return sorted(set(self.seasons.tolist()))
+
+    def season_monthly_totals(self, season=None):
+        """Portfolio recovery per month for one season (or all), cached after the first call."""
+        if season not in self._monthly_totals:
+            rows = self.block if season is None else self.block[self.seasons == season]
+            self._monthly_totals[season] = pd.Series(rows.sum(axis=0), index=MONTHS, name='Recovery_Amount')
+        return self._monthly_totals[season]
+
+    def season_velocity(self, season=None):
+        """Per-division median recovery velocity and mean months since the last payment, cached per season."""
+        if season not in self._velocity:
+            rows = slice(None) if season is None else self.seasons == season
+            frame = pd.DataFrame({
+                'Division': self.divisions[rows],
+                'Recovery_Velocity': self.features['Recovery_Velocity'][rows],
+                'Months_Since_Payment': self.features['Months_Since_Payment'][rows],
+            })
+            self._velocity[season] = (frame.groupby('Division')
+                                      .agg({'Recovery_Velocity': 'median', 'Months_Since_Payment': 'mean'})
+                                      .sort_values('Recovery_Velocity').reset_index())
+        return self._velocity[season]
+
+    def positions(self, df, id_col='Customer_ID', season_col='Loan_Type'):
+        """Store row of each row of ``df``, matched by (Customer_ID, season); ValueError if any is missing."""
+        if self._keys is None:
+            self._keys = pd.MultiIndex.from_arrays([self.customer_ids, self.seasons])
+        keys = pd.MultiIndex.from_arrays([df[id_col].to_numpy(), df[season_col].astype(str).str.strip().to_numpy()])
+        positions = self._keys.get_indexer(keys)
+        if (positions < 0).any():
+            raise ValueError(f"{int((positions < 0).sum())} rows are not in the recovery store")
+        return positions
+
+    def attach_features(self, df):
+        """Write the cached scoring features onto any subset of the store's records."""
+        positions = self.positions(df)
+        for col in SCORING_FEATURES:
+            df[col] = self.features[col][positions]
+        return df
+
+    def cumulative_for(self, df):
+        """Cumulative monthly recovery (rows x 12) for the rows of ``df``."""
+        return self.features['cumulative'][self.positions(df)]
+
+    def to_long(self):
+        """Long-format view: one row per (farmer, season, month)."""
+        n_records, n_months = self.block.shape
+        return pd.DataFrame({
+            'Customer_ID': np.repeat(self.customer_ids, n_months),
+            'Season': np.repeat(self.seasons, n_months),
+            'Division': np.repeat(self.divisions, n_months),
+            'Month': np.tile(MONTH_LABELS, n_records),
+            'Month_Index': np.tile(np.arange(n_months), n_records),
+            'Recovery': self.block.ravel(),
+            'Cumulative_Recovery': self.features['cumulative'].ravel(),
+        })
@@ -0,0 +1,276 @@
+"""Reproducible retraining of the credit-risk model (the notebook's training steps as a pipeline).
+
+1. A stratified 80/20 split with seed 42, as in
+   ``notebooks/2_eda_training_process.ipynb``. The ordinal encoder is fit on the
+   training rows only; the encoded matrix (``MODEL_FEATURES``), the
+   ``Overdue_Status`` target and the split are built once per version of the
+   partitioned data and cached under ``data/features/<fingerprint>/``.
+2. A ``GridSearchCV`` over ``HistGradientBoostingClassifier`` settings on the
+   training rows, run in parallel across cores.
+3. The best model, its encoder and ``metrics.json`` are written to
+   ``models/versions/<version>/``, a layout ``main.py`` can load directly via
+   ``AGRIGUARD_MODEL_DIR``. With promotion, they are also copied atomically into
+   ``models/`` when the test ROC AUC is at least the current model's minus
+   ``--tolerance`` (default 0: never worse).
+
+Drift (population stability index between the training matrix and recent
+``/analyze`` traffic from the audit log) can gate the whole run:
+
+    python -m scripts.retraining --promote
+    python -m scripts.retraining --if-drift --promote     # e.g. from cron
+"""
+
+import json
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from scripts.partitioned_store import PARTITION_ROOT, load_partitions, partition_fingerprint
+from scripts.scoring import CATEGORICAL_FEATURES, MODEL_DIR, MODEL_FEATURES, build_model_frame
+
+FEATURE_CACHE_ROOT = os.path.join("data", "features")
+VERSIONS_DIR = "versions"
+TARGET_COL = "Overdue_Status"
+RANDOM_STATE = 42
+PARAM_GRID = {
+    'learning_rate': [0.05, 0.1, 0.2],
+    'max_iter': [100, 200],
+    'max_leaf_nodes': [15, 31],
+    'min_samples_leaf': [10, 20],
+    'l2_regularization': [0.0, 1.0],
+}
+# Numeric features compared for drift against serving traffic
+DRIFT_FEATURES = ['Loan_Amount', 'Outstanding_Balance', 'Total_Recovery', 'Repayment_Ratio', 'Debt_Ratio']
+PSI_THRESHOLD = 0.2
+
+
+def build_feature_matrix(partition_root=PARTITION_ROOT, cache_root=FEATURE_CACHE_ROOT):
+    """``(X, y, train, encoder, fingerprint)``, loaded from the on-disk cache when the data has not changed.
+
+    ``train`` is a boolean mask of the training rows; the encoder has only seen those,
+    so categories that first appear in the test rows encode as unknown (-1).
+    """
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import OrdinalEncoder
+
+    fingerprint = partition_fingerprint(partition_root)
+    cache_dir = os.path.join(cache_root, fingerprint)
+    if os.path.exists(os.path.join(cache_dir, "meta.json")) and os.path.exists(os.path.join(cache_dir, "train.npy")):
+        X = pd.DataFrame(np.load(os.path.join(cache_dir, "X.npy"), mmap_mode="r"), columns=MODEL_FEATURES)
+        y = np.load(os.path.join(cache_dir, "y.npy"))
+        train = np.load(os.path.join(cache_dir, "train.npy"))
+        return X, y, train, joblib.load(os.path.join(cache_dir, "ordinal_encoder.pkl")), fingerprint
+
+    df = load_partitions(partition_root)
+    df = df[df[TARGET_COL].isin(['Yes', 'No'])]
+    y = (df[TARGET_COL] == 'Yes').to_numpy(dtype=np.int8)
+    train_rows, _ = train_test_split(np.arange(len(df)), test_size=0.2, random_state=RANDOM_STATE, stratify=y)
+    train = np.zeros(len(df), dtype=bool)
+    train[train_rows] = True
+    encoder = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=-1)
+    encoder.fit(df.loc[train, CATEGORICAL_FEATURES])
+    X = build_model_frame(df, encoder, MODEL_FEATURES).astype(np.float64)
+
+    # Written to a staging directory and renamed, so a half-built cache is never read
+    staging = cache_dir + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    np.save(os.path.join(staging, "X.npy"), X.to_numpy())
+    np.save(os.path.join(staging, "y.npy"), y)
+    np.save(os.path.join(staging, "train.npy"), train)
+    joblib.dump(encoder, os.path.join(staging, "ordinal_encoder.pkl"))
+    with open(os.path.join(staging, "meta.json"), "w", encoding="utf-8") as fh:
+        json.dump({"fingerprint": fingerprint, "rows": len(X), "train_rows": int(train.sum()),
+                   "features": MODEL_FEATURES}, fh, indent=2)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(staging, cache_dir)
+    return X.reset_index(drop=True), y, train, encoder, fingerprint
+
+
+def search_hyperparameters(X_train, y_train, param_grid=PARAM_GRID, n_jobs=-1, cv=5, scoring="roc_auc"):
+    """Parallel grid search (one candidate x fold per worker); returns the fitted ``GridSearchCV``."""
+    from sklearn.ensemble import HistGradientBoostingClassifier
+    from sklearn.model_selection import GridSearchCV, StratifiedKFold
+
+    search = GridSearchCV(
+        HistGradientBoostingClassifier(random_state=RANDOM_STATE),
+        param_grid,
+        scoring=scoring,
+        cv=StratifiedKFold(n_splits=cv, shuffle=True, random_state=RANDOM_STATE),
+        n_jobs=n_jobs,
+        refit=True,
+    )
+    return search.fit(X_train, y_train)
+
+
+def evaluate(model, X_test, y_test):
+    from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+
+    y_pred = model.predict(X_test)
+    metrics = {"accuracy": accuracy_score(y_test, y_pred), "f1": f1_score(y_test, y_pred)}
+    if len(np.unique(y_test)) > 1:
+        metrics["roc_auc"] = roc_auc_score(y_test, model.predict_proba(X_test)[:, 1])
+    return {k: round(float(v), 4) for k, v in metrics.items()}
+
+
+def _write_artifacts(out_dir, model, encoder, metrics):
+    staging = out_dir + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    joblib.dump(model, os.path.join(staging, "credit_risk_model.pkl"))
+    joblib.dump(encoder, os.path.join(staging, "ordinal_encoder.pkl"))
+    with open(os.path.join(staging, "metrics.json"), "w", encoding="utf-8") as fh:
+        json.dump(metrics, fh, indent=2)
+    os.replace(staging, out_dir)
+
+
+def read_metrics(model_dir=MODEL_DIR):
+    path = os.path.join(model_dir, "metrics.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def promote(version_dir, model_dir=MODEL_DIR):
+    """Copy a version's artifacts into ``model_dir`` (each file swapped atomically)."""
+    for name in ("ordinal_encoder.pkl", "credit_risk_model.pkl", "metrics.json"):
+        tmp = os.path.join(model_dir, f".{name}.tmp")
+        shutil.copyfile(os.path.join(version_dir, name), tmp)
+        os.replace(tmp, os.path.join(model_dir, name))
+
+
+def retrain(partition_root=PARTITION_ROOT, model_dir=MODEL_DIR, cache_root=FEATURE_CACHE_ROOT,
+            param_grid=PARAM_GRID, n_jobs=-1, cv=5, promote_if_better=False, tolerance=0.0, reason="manual"):
+    """Run the full pipeline; returns the metrics dict (including ``version`` and ``promoted``).
+
+    With ``promote_if_better``, the new version replaces ``model_dir`` when its test
+    ROC AUC is at least the current one minus ``tolerance``.
+    """
+    from sklearn import __version__ as sklearn_version
+
+    started = time.perf_counter()
+    X, y, train, encoder, fingerprint = build_feature_matrix(partition_root, cache_root)
+    X_train, X_test, y_train, y_test = X[train], X[~train], y[train], y[~train]
+    search = search_hyperparameters(X_train, y_train, param_grid, n_jobs, cv)
+    model = search.best_estimator_
+
+    version = f"v{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{fingerprint[:8]}"
+    metrics = {
+        "version": version,
+        "reason": reason,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "data_fingerprint": fingerprint,
+        "rows": int(len(X)),
+        "train_rows": int(train.sum()),
+        "positive_rate": round(float(y.mean()), 4),
+        "feature_order": MODEL_FEATURES,
+        "best_params": search.best_params_,
+        "cv_roc_auc": round(float(search.best_score_), 4),
+        "candidates": len(search.cv_results_["params"]),
+        "test": evaluate(model, X_test, y_test),
+        "sklearn_version": sklearn_version,
+        "random_state": RANDOM_STATE,
+        "train_seconds": round(time.perf_counter() - started, 1),
+    }
+
+    version_dir = os.path.join(model_dir, VERSIONS_DIR, version)
+    os.makedirs(os.path.dirname(version_dir), exist_ok=True)
+    _write_artifacts(version_dir, model, encoder, metrics)
+
+    current = read_metrics(model_dir)
+    current_auc = ((current or {}).get("test") or {}).get("roc_auc")
+    new_auc = metrics["test"].get("roc_auc")
+    better = current_auc is None or (new_auc is not None and new_auc >= current_auc - tolerance)
+    metrics["promotion_tolerance"] = tolerance
+    metrics["promoted"] = bool(promote_if_better and better)
+    if metrics["promoted"]:
+        promote(version_dir, model_dir)
+    return metrics
+
+
+def population_stability_index(expected, actual, bins=10):
+    """PSI of ``actual`` against ``expected`` using the expected sample's quantile bins."""
+    expected = np.asarray(expected, dtype=float)
+    actual = np.asarray(actual, dtype=float)
+    expected, actual = expected[np.isfinite(expected)], actual[np.isfinite(actual)]
+    if len(expected) == 0 or len(actual) == 0:
+        return 0.0
+    edges = np.unique(np.quantile(expected, np.linspace(0, 1, bins + 1)))
+    if len(edges) < 2:
+        return 0.0
+    edges[0], edges[-1] = -np.inf, np.inf
+    e = np.histogram(expected, edges)[0] / len(expected)
+    a = np.histogram(actual, edges)[0] / len(actual)
+    e, a = np.clip(e, 1e-6, None), np.clip(a, 1e-6, None)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def serving_features(since=None, limit=50_000):
+    """Numeric model inputs seen by ``/analyze``, rebuilt from the audit log."""
+    from scripts.audit_log import AUDIT_DB, read_decisions
+
+    if not os.path.exists(AUDIT_DB):
+        return pd.DataFrame(columns=DRIFT_FEATURES)
+    decisions = read_decisions(AUDIT_DB, since=since, limit=limit)
+    loan = decisions['loan_amount']
+    return pd.DataFrame({
+        'Loan_Amount': loan,
+        'Outstanding_Balance': decisions['outstanding'],
+        'Total_Recovery': decisions['recovery'],
+        'Repayment_Ratio': decisions['recovery'] / loan,
+        'Debt_Ratio': decisions['outstanding'] / loan,
+    })
+
+
+def check_drift(partition_root=PARTITION_ROOT, cache_root=FEATURE_CACHE_ROOT, recent=None,
+                threshold=PSI_THRESHOLD, min_rows=200):
+    """PSI per feature between the training matrix and ``recent`` inputs (default: the audit log)."""
+    X, _, train, _, _ = build_feature_matrix(partition_root, cache_root)
+    X = X[train]
+    recent = serving_features() if recent is None else recent
+    psi = {name: round(population_stability_index(X[name], recent[name]), 4) for name in DRIFT_FEATURES}
+    drifted = len(recent) >= min_rows and max(psi.values()) > threshold
+    return {"rows": int(len(recent)), "psi": psi, "threshold": threshold, "drifted": bool(drifted)}
+
+
+def retrain_if_drifted(threshold=PSI_THRESHOLD, **retrain_args):
+    """Retrain (and promote if at least as good) only when serving traffic has drifted."""
+    drift = check_drift(retrain_args.get("partition_root", PARTITION_ROOT),
+                        retrain_args.get("cache_root", FEATURE_CACHE_ROOT), threshold=threshold)
+    if not drift["drifted"]:
+        return {"drift": drift, "retrained": False}
+    retrain_args.setdefault("promote_if_better", True)
+    metrics = retrain(reason=f"drift: max PSI {max(drift['psi'].values()):.3f}", **retrain_args)
+    return {"drift": drift, "retrained": True, "metrics": metrics}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Retrain the credit-risk model from the partitioned portfolio.")
+    parser.add_argument("--partitions", default=PARTITION_ROOT)
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--jobs", type=int, default=-1, help="parallel workers for the search (-1 = all cores)")
+    parser.add_argument("--cv", type=int, default=5)
+    parser.add_argument("--promote", action="store_true",
+                        help="copy the new version into --model-dir if its test ROC AUC is not worse "
+                             "than the current model's by more than --tolerance")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="ROC AUC drop still accepted for promotion (default 0: never worse)")
+    parser.add_argument("--if-drift", action="store_true", help="only retrain when serving data has drifted")
+    parser.add_argument("--psi-threshold", type=float, default=PSI_THRESHOLD)
+    args = parser.parse_args()
+
+    common = dict(partition_root=args.partitions, model_dir=args.model_dir, n_jobs=args.jobs, cv=args.cv,
+                  tolerance=args.tolerance)
+    if args.if_drift:
+        result = retrain_if_drifted(args.psi_threshold, promote_if_better=args.promote, **common)
+    else:
+        result = retrain(promote_if_better=args.promote, **common)
+    print(json.dumps(result, indent=2, default=str))
@@ -0,0 +1,77 @@
+"""Portfolio scoring shared by the dashboard, the API and the background jobs."""
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from scripts.recovery_store import MONTHS
+
+MODEL_DIR = os.environ.get("AGRIGUARD_MODEL_DIR", "models")
+CATEGORICAL_FEATURES = ['Loan_Type', 'Officer_Assigned', 'Division']
+# Column order used when the model was trained (notebooks/2_eda_training_process.ipynb)
+MODEL_FEATURES = CATEGORICAL_FEATURES + ['Loan_Amount', 'Outstanding_Balance', 'Total_Recovery',
+                                         'Repayment_Ratio', 'Debt_Ratio']
+RISK_LABELS = ['Low Risk', 'Medium Risk', 'High Risk']
+RISK_BINS = [0, 0.35, 0.65, 1.0]
+
+
+def load_model_assets(model_dir=MODEL_DIR):
+    """Return ``(model, encoder)`` saved by the training notebook."""
+    model = joblib.load(os.path.join(model_dir, 'credit_risk_model.pkl'))
+    encoder = joblib.load(os.path.join(model_dir, 'ordinal_encoder.pkl'))
+    return model, encoder
+
+
+def model_feature_order(model):
+    return list(getattr(model, 'feature_names_in_', MODEL_FEATURES))
+
+
+def build_model_frame(df, encoder, feature_order=MODEL_FEATURES):
+    """Engineer and ordinal-encode the model's input columns for a whole portfolio frame."""
+    total = df['Total_Paid'] if 'Total_Paid' in df.columns else df[MONTHS].sum(axis=1)
+    loan = df['Loan_Amount']
+    X = pd.DataFrame({
+        'Loan_Type': df['Loan_Type'],
+        'Officer_Assigned': df['Officer_Assigned'],
+        'Division': df['Division'],
+        'Loan_Amount': loan,
+        'Outstanding_Balance': df['Outstanding_Balance'],
+        'Total_Recovery': total,
+        'Repayment_Ratio': total / loan,
+        'Debt_Ratio': df['Outstanding_Balance'] / loan,
+    }, index=df.index)
+    X[CATEGORICAL_FEATURES] = encoder.transform(X[CATEGORICAL_FEATURES])
+    return X[list(feature_order)]
+
+
+def dashboard_default_prob(outstanding, loan_amount, repayment_percent):
+    """Debt-ratio / repayment blend used by the dashboard; works on scalars, arrays and Series."""
+    loan_amount = np.where(np.asarray(loan_amount) == 0, 1, loan_amount)
+    prob = (np.asarray(outstanding) / loan_amount) * 0.55 + (1 - (np.asarray(repayment_percent) / 100)) * 0.45
+    prob = np.clip(prob, 0, 1)
+    return prob if prob.ndim else float(prob)
+
+
+def score_portfolio(df):
+    """Dashboard default-probability score and banking risk tiers (adds Default_Prob / Risk_Category)."""
+    # PRO-TIP: To use your .pkl, replace the logic below with:
+    # df['Default_Prob'] = model.predict_proba(build_model_frame(df, encoder))[:, 1]
+
+    # Grounded Simulation Logic for MSc Project
+    df['Default_Prob'] = dashboard_default_prob(df['Outstanding_Balance'], df['Loan_Amount'], df['Repayment_Percent'])
+
+    # Risk Categorization based on Banking Thresholds
+    df['Risk_Category'] = pd.cut(df['Default_Prob'],
+                                 bins=RISK_BINS,
+                                 labels=RISK_LABELS)
+    return df
+
+
+def risk_category(prob):
+    """Risk tier of a single probability; matches ``pd.cut`` in ``score_portfolio`` (None outside (0, 1])."""
+    for upper, label in zip(RISK_BINS[1:], RISK_LABELS):
+        if RISK_BINS[0] < prob <= upper:
+            return label
+    return None
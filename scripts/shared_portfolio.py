@@ -0,0 +1,167 @@
+"""Immutable, Arrow-backed portfolio shared by every dashboard session.
+
+The scored portfolio is held once per process as a ``pyarrow.Table`` sorted by
+season and division. A season / division selection is then a contiguous range
+of rows, and a ``PortfolioView`` is a zero-copy slice of the shared buffers.
+Conversion to pandas maps numeric columns straight onto the Arrow buffers
+(read-only) and strings to ``pd.ArrowDtype``, so a session costs only its small
+index and metadata, not a full copy of the portfolio.
+
+Derived columns (e.g. ``Loan_Status``) are registered with ``derived_column``.
+Each is computed from the full table the first time any view asks for it, then
+sliced like the base columns.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+SEASON_COL = "Loan_Type"
+DIVISION_COL = "Division"
+
+DERIVED_COLUMNS = {}
+
+
+def derived_column(name):
+    """Register ``func(table) -> array-like`` as the lazily computed column ``name``."""
+    def decorator(func):
+        DERIVED_COLUMNS[name] = func
+        return func
+    return decorator
+
+
+COURT_ACTIONS = ["Court", "උසාවි"]
+MEDIATION_ACTIONS = ["Adjudication_Board", "බේරුම්කරණ"]
+
+
+@derived_column("Loan_Status")
+def _loan_status(table):
+    # Vectorized form of the old row-wise categorize() in load_bank_data
+    action = table.column("Action_Taken").to_pandas().astype(str).str.strip()
+    repayment = table.column("Repayment_Percent").to_numpy()
+    return np.select(
+        [action.isin(COURT_ACTIONS), action.isin(MEDIATION_ACTIONS), repayment >= 80],
+        ["🚨 Court Action", "⚠️ Mediation", "✅ Excellent"],
+        "🔵 Active",
+    )
+
+
+def loan_status(action, repayment_percent):
+    """``Loan_Status`` of a single farmer (same rules as the derived column)."""
+    action = str(action).strip()
+    if action in COURT_ACTIONS:
+        return "🚨 Court Action"
+    if action in MEDIATION_ACTIONS:
+        return "⚠️ Mediation"
+    return "✅ Excellent" if repayment_percent >= 80 else "🔵 Active"
+
+
+def _pandas_type(arrow_type):
+    # Strings stay in their Arrow buffers; numerics are zero-copy already; dictionaries become Categorical
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
+
+
+class SharedPortfolio:
+    """One read-only scored portfolio per process; hand out ``view()`` slices per session."""
+
+    def __init__(self, table):
+        self.table = table
+        self._derived = {}
+        self._lock = threading.Lock()
+        seasons = table.column(SEASON_COL).to_pandas()
+        divisions = table.column(DIVISION_COL).to_pandas()
+        # (season, division) -> (offset, length) of its contiguous row range
+        keys = pd.DataFrame({'season': seasons, 'division': divisions})
+        bounds = keys.reset_index().groupby(['season', 'division'], sort=False)['index'].agg(['min', 'count'])
+        self._ranges = {key: (int(start), int(count)) for key, (start, count) in bounds.iterrows()}
+
+    @classmethod
+    def from_frame(cls, df):
+        """Copy a portfolio frame into Arrow once, sorted by season and division (stable)."""
+        ordered = df.sort_values([SEASON_COL, DIVISION_COL], kind="stable")
+        table = pa.Table.from_pandas(ordered, preserve_index=False)
+        return cls(table.combine_chunks())
+
+    def __len__(self):
+        return self.table.num_rows
+
+    @property
+    def columns(self):
+        return self.table.column_names
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes + sum(a.nbytes for a in self._derived.values())
+
+    def seasons(self):
+        return sorted({s for s, _ in self._ranges})
+
+    def divisions(self, seasons=None):
+        return sorted({d for s, d in self._ranges if seasons is None or s in seasons})
+
+    def derived(self, name):
+        """Full-length derived column, computed on first use and then shared."""
+        with self._lock:
+            column = self._derived.get(name)
+            if column is None:
+                column = self._derived[name] = pa.array(DERIVED_COLUMNS[name](self.table))
+        return column
+
+    def _slices(self, seasons=None, divisions=None):
+        ranges = sorted(
+            rng for (s, d), rng in self._ranges.items()
+            if (seasons is None or s in seasons) and (divisions is None or d in divisions)
+        )
+        # Adjacent ranges (e.g. every division of one season) merge into a single slice
+        merged = []
+        for start, length in ranges:
+            if merged and merged[-1][0] + merged[-1][1] == start:
+                merged[-1] = (merged[-1][0], merged[-1][1] + length)
+            else:
+                merged.append((start, length))
+        return merged
+
+    def view(self, seasons=None, divisions=None):
+        """Zero-copy view of the selected seasons / divisions (``None`` = no filter)."""
+        return PortfolioView(self, self._slices(seasons, divisions), seasons, divisions)
+
+
+class PortfolioView:
+    """A session's window onto a ``SharedPortfolio``; holds offsets, not data."""
+
+    def __init__(self, portfolio, slices, seasons=None, divisions=None):
+        self.portfolio = portfolio
+        self.slices = slices
+        self.seasons = seasons
+        self.divisions = divisions
+
+    def __len__(self):
+        return sum(length for _, length in self.slices)
+
+    def narrow(self, divisions):
+        """Same seasons, restricted to ``divisions``."""
+        return self.portfolio.view(self.seasons, divisions)
+
+    def column(self, name):
+        """One base or derived column as a (chunked) Arrow array over the view's rows."""
+        if name in self.portfolio.table.column_names:
+            source = self.portfolio.table.column(name)
+        else:
+            source = self.portfolio.derived(name)
+        chunks = [source.slice(start, length) for start, length in self.slices]
+        if not chunks:
+            return pa.chunked_array([], type=source.type)
+        return pa.chunked_array([c for chunk in chunks for c in getattr(chunk, "chunks", [chunk])], type=source.type)
+
+    def to_arrow(self, columns=None, derived=()):
+        names = list(columns) if columns is not None else self.portfolio.columns
+        names += [d for d in derived if d not in names]
+        return pa.table({name: self.column(name) for name in names})
+
+    def to_pandas(self, columns=None, derived=()):
+        """Read-only pandas frame over the view; zero-copy for single-range numeric and string columns."""
+        return self.to_arrow(columns, derived).to_pandas(split_blocks=True, types_mapper=_pandas_type)
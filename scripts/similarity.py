@@ -0,0 +1,192 @@
+"""Similar-farmer search over repayment profiles.
+
+The index keeps one vector per farmer (per ``Customer_ID``), built from:
+
+* the twelve monthly recoveries as shares of the loan, which gives the shape of
+  the repayment pattern independent of loan size;
+* log loan amount and log outstanding balance, standardised with the
+  portfolio's mean and std and weighted by ``amount_weight``.
+
+The vectors live in a scikit-learn ``KDTree`` (or ``BallTree``). Inserts go to a
+small pending buffer that is searched by brute force, and the tree is rebuilt
+once the buffer outgrows ``rebuild_fraction`` of the tree. An insert is
+amortised O(log n). Re-inserting a ``Customer_ID`` replaces that farmer's earlier
+vector; if one ID appears in several seasons, the last record indexed is kept.
+Queries return the k nearest records with their outcomes (overdue status,
+action taken, repayment %).
+
+    index = SimilarityIndex.from_frame(portfolio)
+    index.query_customer("CID-0018", k=10)
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree, KDTree
+
+from scripts.recovery_store import MONTHS
+
+TREES = {"kd_tree": KDTree, "ball_tree": BallTree}
+OUTCOME_FIELDS = ['Customer_ID', 'Loan_Type', 'Division', 'Loan_Amount', 'Outstanding_Balance',
+                  'Total_Paid', 'Repayment_Percent', 'Overdue_Status', 'Action_Taken', 'Loan_Status']
+
+
+def _records(df):
+    """Outcome records for each row (Total_Paid / Repayment_Percent derived when missing)."""
+    df = df[[c for c in OUTCOME_FIELDS + MONTHS if c in df.columns]].copy()
+    if 'Total_Paid' not in df.columns:
+        df['Total_Paid'] = df[MONTHS].sum(axis=1)
+    if 'Repayment_Percent' not in df.columns:
+        df['Repayment_Percent'] = df['Total_Paid'] / df['Loan_Amount'].replace(0, 1) * 100
+    return df[[c for c in OUTCOME_FIELDS if c in df.columns]].to_dict(orient="records")
+
+
+class SimilarityIndex:
+    """k-nearest-neighbour index over repayment profiles with incremental inserts."""
+
+    def __init__(self, amount_scale, amount_weight=0.5, algorithm="kd_tree", leaf_size=40,
+                 rebuild_fraction=0.1, min_rebuild=64):
+        self.amount_scale = amount_scale  # (mean, std) of [log loan, log outstanding]
+        self.amount_weight = amount_weight
+        self.algorithm = algorithm
+        self.leaf_size = leaf_size
+        self.rebuild_fraction = rebuild_fraction
+        self.min_rebuild = min_rebuild
+        self._buffer = np.empty((0, len(MONTHS) + 2))  # grows by doubling; rows [0, len(_records)) are used
+        self._records = []
+        self._positions = {}       # customer id -> live position
+        self._deleted = set()      # superseded positions, skipped in results
+        self._tree = None
+        self._tree_size = 0        # positions [0, _tree_size) are in the tree, the rest are pending
+        self._pending = []
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        """Fit the amount scaling on ``df`` and index all of its rows."""
+        amounts = np.log1p(df[['Loan_Amount', 'Outstanding_Balance']].to_numpy(dtype=np.float64).clip(min=0))
+        std = amounts.std(axis=0)
+        index = cls((amounts.mean(axis=0), np.where(std > 0, std, 1.0)), **kwargs)
+        index._append(index.vectorize(df), _records(df))
+        index._rebuild()
+        return index
+
+    def _profile(self, block, loan, outstanding):
+        shares = block / np.where(loan == 0, 1.0, loan)[:, None]
+        amounts = np.log1p(np.column_stack([loan, outstanding]).clip(min=0))
+        mean, std = self.amount_scale
+        return np.hstack([shares, self.amount_weight * (amounts - mean) / std])
+
+    def vectorize(self, df):
+        """Profile vectors for a frame with the monthly recovery, loan and outstanding columns."""
+        return self._profile(df[MONTHS].to_numpy(dtype=np.float64), df['Loan_Amount'].to_numpy(dtype=np.float64),
+                             df['Outstanding_Balance'].to_numpy(dtype=np.float64))
+
+    def __len__(self):
+        return len(self._positions)
+
+    @property
+    def _vectors(self):
+        return self._buffer[:len(self._records)]
+
+    def _append(self, vectors, records):
+        start = len(self._records)
+        needed = start + len(vectors)
+        if needed > len(self._buffer):
+            grown = np.empty((max(needed, 2 * len(self._buffer)), self._buffer.shape[1]))
+            grown[:start] = self._buffer[:start]
+            self._buffer = grown
+        self._buffer[start:needed] = vectors
+        for offset, record in enumerate(records):
+            previous = self._positions.get(record['Customer_ID'])
+            if previous is not None:
+                self._deleted.add(previous)
+            self._positions[record['Customer_ID']] = start + offset
+            self._records.append(record)
+        return range(start, start + len(records))
+
+    def _rebuild(self):
+        """Rebuild the tree over the live vectors and compact away superseded ones."""
+        live = sorted(self._positions.values())
+        self._buffer = self._vectors[live]
+        self._records = [self._records[p] for p in live]
+        self._positions = {r['Customer_ID']: i for i, r in enumerate(self._records)}
+        self._deleted.clear()
+        self._pending = []
+        self._tree_size = len(self._records)
+        self._tree = TREES[self.algorithm](self._vectors, leaf_size=self.leaf_size) if self._tree_size else None
+
+    def insert(self, df):
+        """Add (or replace, by Customer_ID) the rows of ``df``; the tree is rebuilt only occasionally."""
+        with self._lock:
+            self._pending.extend(self._append(self.vectorize(df), _records(df)))
+            self._maybe_rebuild()
+
+    def insert_record(self, record):
+        """Add or replace one farmer from a plain dict (the per-event path; no DataFrame overhead)."""
+        block = np.array([[float(record.get(m, 0.0)) for m in MONTHS]])
+        loan = float(record['Loan_Amount'])
+        vector = self._profile(block, np.array([loan]), np.array([float(record['Outstanding_Balance'])]))
+        outcome = {c: record[c] for c in OUTCOME_FIELDS if c in record}
+        outcome.setdefault('Total_Paid', float(block.sum()))
+        outcome.setdefault('Repayment_Percent', outcome['Total_Paid'] / (loan or 1) * 100)
+        with self._lock:
+            self._pending.extend(self._append(vector, [outcome]))
+            self._maybe_rebuild()
+
+    def _maybe_rebuild(self):
+        if len(self._pending) + len(self._deleted) > max(self.min_rebuild, self.rebuild_fraction * self._tree_size):
+            self._rebuild()
+
+    def query(self, vectors, k=10, exclude=()):
+        """Nearest live records to each vector: a list of DataFrames (``Distance`` + outcome fields)."""
+        exclude = set(exclude)
+        with self._lock:
+            vectors = np.atleast_2d(vectors)
+            # Over-fetch from the tree to make up for superseded and excluded positions
+            fetch = min(self._tree_size, k + len(self._deleted) + len(exclude))
+            results = []
+            tree_hits = self._tree.query(vectors, k=fetch) if self._tree is not None and fetch else None
+            pending = np.asarray(self._pending, dtype=int)
+            for row, vector in enumerate(vectors):
+                if tree_hits is not None:
+                    distances, positions = tree_hits[0][row], tree_hits[1][row]
+                else:
+                    distances, positions = np.empty(0), np.empty(0, dtype=int)
+                if len(pending):
+                    distances = np.concatenate([distances, np.linalg.norm(self._vectors[pending] - vector, axis=1)])
+                    positions = np.concatenate([positions, pending])
+                hits = []
+                for i in np.argsort(distances, kind="stable"):
+                    position = int(positions[i])
+                    record = self._records[position]
+                    if position in self._deleted or record['Customer_ID'] in exclude:
+                        continue
+                    hits.append({'Distance': round(float(distances[i]), 4), **record})
+                    if len(hits) == k:
+                        break
+                results.append(pd.DataFrame(hits))
+            return results
+
+    def query_frame(self, df, k=10):
+        """Neighbours for a single new profile (one-row frame)."""
+        return self.query(self.vectorize(df), k)[0]
+
+    def query_customer(self, customer_id, k=10):
+        """Neighbours of an indexed farmer, excluding the farmer themself; KeyError if unknown."""
+        with self._lock:
+            vector = self._vectors[self._positions[customer_id]]
+        return self.query(vector, k, exclude=(customer_id,))[0]
+
+
+def outcome_summary(neighbours):
+    """Share of neighbours that went overdue and their mean repayment, for a one-line verdict."""
+    if neighbours.empty:
+        return {"neighbours": 0, "overdue_share": None, "mean_repayment_percent": None}
+    overdue = neighbours['Overdue_Status'].eq('Yes').mean() if 'Overdue_Status' in neighbours else None
+    return {
+        "neighbours": len(neighbours),
+        "overdue_share": None if overdue is None else round(float(overdue), 3),
+        "mean_repayment_percent": round(float(neighbours['Repayment_Percent'].mean()), 1),
+    }
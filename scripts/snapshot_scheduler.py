@@ -0,0 +1,216 @@
+"""Background precompute of dashboard snapshots.
+
+A daemon thread rebuilds the scored portfolio, the division rollups and the SHAP
+summary whenever the partitioned source data or the model files change, and on a
+fixed interval. Each build is written to a fresh ``data/snapshots/v<N>`` directory
+and published by atomically swapping the ``CURRENT`` pointer, so readers always
+see a complete snapshot and never wait on recomputation. ``meta.json`` records
+the build time and why a table is missing (e.g. a model that cannot score the data).
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import pandas as pd
+
+from scripts.partitioned_store import MANIFEST_NAME, PARTITION_ROOT, ensure_partitions, load_partitions
+from scripts.recovery_store import RecoveryStore
+from scripts.scoring import MODEL_DIR, load_model_assets, score_portfolio
+
+SNAPSHOT_ROOT = os.path.join("data", "snapshots")
+POINTER_NAME = "CURRENT"
+SNAPSHOT_TABLES = ("portfolio", "division_rollup", "shap_summary", "meta")
+KEEP_VERSIONS = 3
+
+logger = logging.getLogger(__name__)
+
+
+def build_division_rollup(portfolio):
+    """Per season/division aggregates used by the overview and XAI benchmark charts."""
+    return portfolio.groupby(['Loan_Type', 'Division'], observed=True).agg(
+        Farmer_Count=('Customer_ID', 'count'),
+        Loan_Amount=('Loan_Amount', 'sum'),
+        Outstanding_Balance=('Outstanding_Balance', 'sum'),
+        Total_Paid=('Total_Paid', 'sum'),
+        Repayment_Percent=('Repayment_Percent', 'mean'),
+        Default_Prob=('Default_Prob', 'mean'),
+        High_Risk_Count=('Risk_Category', lambda s: int((s == 'High Risk').sum())),
+    ).reset_index()
+
+
+def build_shap_summary(portfolio, model_dir=MODEL_DIR):
+    """Mean |SHAP| per model feature over the whole portfolio; returns ``(table, error)``.
+
+    A missing model or one that cannot score this data (e.g. an encoder that does not
+    know a season or division) gives ``(None, reason)``; anything else fails the build.
+    """
+    from scripts.explainability import explain_portfolio
+
+    try:
+        model, encoder = load_model_assets(model_dir)
+        # Chunked under the engine's memory cap; resume=False since the portfolio may have changed
+        importance = explain_portfolio(model, encoder, portfolio, interactions=False, resume=False).feature_importance()
+    except (OSError, KeyError, ValueError) as e:
+        logger.warning("SHAP summary skipped: %s", e)
+        return None, f"{type(e).__name__}: {e}"
+    return pd.DataFrame({
+        'Feature': importance.index,
+        'Impact': importance['Mean_Abs_SHAP'].to_numpy(),
+    }), None
+
+
+def build_snapshot(partition_root=PARTITION_ROOT, model_dir=MODEL_DIR):
+    portfolio = load_partitions(partition_root)
+    RecoveryStore.from_frame(portfolio).attach_features(portfolio)
+    score_portfolio(portfolio)
+    shap_summary, shap_error = build_shap_summary(portfolio, model_dir)
+    return {
+        'portfolio': portfolio,
+        'division_rollup': build_division_rollup(portfolio),
+        'shap_summary': shap_summary,
+        'meta': {'built_at': time.time(), 'shap_summary_error': shap_error},
+    }
+
+
+def current_version(root=SNAPSHOT_ROOT):
+    try:
+        with open(os.path.join(root, POINTER_NAME), encoding="utf-8") as fh:
+            return fh.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_snapshot(tables, root=SNAPSHOT_ROOT):
+    """Write a new snapshot version and publish it atomically; returns the version name."""
+    os.makedirs(root, exist_ok=True)
+    existing = sorted(d for d in os.listdir(root) if d.startswith("v") and d[1:].isdigit())
+    version = f"v{int(existing[-1][1:]) + 1 if existing else 1:06d}"
+
+    staging = os.path.join(root, f".{version}.tmp")
+    os.makedirs(staging, exist_ok=True)
+    for name, table in tables.items():
+        if isinstance(table, dict):
+            with open(os.path.join(staging, f"{name}.json"), "w", encoding="utf-8") as fh:
+                json.dump(table, fh)
+        elif table is not None:
+            table.to_pickle(os.path.join(staging, f"{name}.pkl"))
+    os.replace(staging, os.path.join(root, version))
+
+    pointer_tmp = os.path.join(root, f"{POINTER_NAME}.tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as fh:
+        fh.write(version)
+    os.replace(pointer_tmp, os.path.join(root, POINTER_NAME))
+
+    # Older versions are kept briefly so sessions mid-read are not pulled from under
+    versions = sorted(d for d in os.listdir(root) if d.startswith("v") and d[1:].isdigit())
+    for old in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return version
+
+
+def read_snapshot(version, root=SNAPSHOT_ROOT, tables=SNAPSHOT_TABLES):
+    """Load the given tables of one snapshot version (missing tables come back as None)."""
+    loaded = {}
+    for name in tables:
+        path = os.path.join(root, version, name)
+        if os.path.exists(path + ".pkl"):
+            loaded[name] = pd.read_pickle(path + ".pkl")
+        elif os.path.exists(path + ".json"):
+            with open(path + ".json", encoding="utf-8") as fh:
+                loaded[name] = json.load(fh)
+        else:
+            loaded[name] = None
+    return loaded
+
+
+def source_fingerprint(partition_root=PARTITION_ROOT, model_dir=MODEL_DIR):
+    """Modification times of everything a snapshot is derived from."""
+    paths = [os.path.join(partition_root, MANIFEST_NAME),
+             os.path.join(model_dir, 'credit_risk_model.pkl'),
+             os.path.join(model_dir, 'ordinal_encoder.pkl')]
+    return tuple(os.path.getmtime(p) if os.path.exists(p) else None for p in paths)
+
+
+class SnapshotScheduler(threading.Thread):
+    """Daemon thread that keeps ``SNAPSHOT_ROOT`` warm.
+
+    Rebuilds when the source fingerprint changes (checked every ``poll_seconds``)
+    or when ``interval_seconds`` have passed since the last build. When
+    ``source_csv`` is given, the partitions are refreshed from it first.
+    """
+
+    def __init__(self, partition_root=PARTITION_ROOT, model_dir=MODEL_DIR, snapshot_root=SNAPSHOT_ROOT,
+                 interval_seconds=3600, poll_seconds=15, source_csv=None):
+        super().__init__(name="agriguard-snapshot-scheduler", daemon=True)
+        self.source_csv = source_csv
+        self.partition_root = partition_root
+        self.model_dir = model_dir
+        self.snapshot_root = snapshot_root
+        self.interval_seconds = interval_seconds
+        self.poll_seconds = poll_seconds
+        self.last_build = None
+        self.last_error = None
+        self._fingerprint = None
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+
+    def rebuild(self):
+        fingerprint = source_fingerprint(self.partition_root, self.model_dir)
+        start = time.perf_counter()
+        tables = build_snapshot(self.partition_root, self.model_dir)
+        version = write_snapshot(tables, self.snapshot_root)
+        self._fingerprint = fingerprint
+        self.last_build = {"version": version, "seconds": time.perf_counter() - start, "at": time.time()}
+        logger.info("Snapshot %s built in %.2fs", version, self.last_build["seconds"])
+        return version
+
+    def _due(self):
+        if current_version(self.snapshot_root) is None or self.last_build is None:
+            return True
+        if source_fingerprint(self.partition_root, self.model_dir) != self._fingerprint:
+            return True
+        return time.time() - self.last_build["at"] >= self.interval_seconds
+
+    def trigger(self):
+        """Force a rebuild on the next loop iteration."""
+        self.last_build = None
+        self._wake.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                if self.source_csv:
+                    ensure_partitions(self.source_csv, self.partition_root)
+                if self._due():
+                    self.rebuild()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                logger.exception("Snapshot rebuild failed")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build one dashboard snapshot, or keep rebuilding with --watch.")
+    parser.add_argument("--watch", action="store_true")
+    parser.add_argument("--interval", type=int, default=3600)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    scheduler = SnapshotScheduler(interval_seconds=args.interval,
+                                  source_csv=os.path.join("data", "processed", "1_processed_loan_data_csv.csv"))
+    if args.watch:
+        scheduler.start()
+        scheduler.join()
+    else:
+        print(scheduler.rebuild())
@@ -0,0 +1,253 @@
+"""Monte Carlo portfolio stress testing.
+
+A shock describes a harvest failure in some divisions:
+
+    {"divisions": ["Thonigala", "Divulwewa"],  # None = every division
+     "recovery_cut": 0.4,                     # mean share of the season's recovery lost
+     "cut_spread": 0.1,                       # std of that share across scenarios / divisions
+     "delay_months": 2,                       # recoveries arrive this many months later;
+                                              # any pushed past December are lost this season
+     "probability": 1.0}                      # chance the shock happens in a scenario
+
+In every scenario each shock fires (or not), and a severity is drawn per
+division. Each farmer's recovery, outstanding balance and ratios are
+recomputed from the cumulative monthly recovery and rescored in one
+vectorized call. Defaults are then drawn from the stressed probabilities, and
+loss = default x stressed outstanding x LGD. Scenarios run in chunks of at most
+``max_rows`` farmer-scenarios. The first chunk runs in-process and is timed; when
+the remaining chunks would take longer serially than starting a process pool
+(``POOL_STARTUP_SECONDS``) saves, they go to a pool with one worker per core, and
+the portfolio and scorer are shipped to each worker once. Every chunk has its own seed
+from one ``SeedSequence``, so results do not depend on the worker count.
+
+    python -m scripts.stress_test --divisions Thonigala Divulwewa --cut 0.4 --delay 2 --scenarios 5000
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scripts.recovery_store import MONTHS, RecoveryStore
+from scripts.scoring import CATEGORICAL_FEATURES, MODEL_FEATURES, dashboard_default_prob
+
+LOSS_GIVEN_DEFAULT = 0.45
+PERCENTILES = (50, 95, 99)
+# Time until a spawned worker is ready to simulate (imports + unpickling the portfolio and
+# scorer), measured at about 0.8 s with the dashboard formula and 2 s with the sklearn model
+POOL_STARTUP_SECONDS = 2.0
+SHOCK_DEFAULTS = {"divisions": None, "recovery_cut": 0.0, "cut_spread": 0.0, "delay_months": 0, "probability": 1.0}
+
+
+def normalize_shock(spec):
+    """Fill defaults and validate one shock specification."""
+    unknown = set(spec) - set(SHOCK_DEFAULTS)
+    if unknown:
+        raise ValueError(f"unknown shock fields: {sorted(unknown)}")
+    shock = {**SHOCK_DEFAULTS, **spec}
+    if not 0 <= shock["recovery_cut"] <= 1 or not 0 <= shock["probability"] <= 1:
+        raise ValueError("recovery_cut and probability must be between 0 and 1")
+    if not 0 <= int(shock["delay_months"]) <= len(MONTHS):
+        raise ValueError(f"delay_months must be between 0 and {len(MONTHS)}")
+    shock["delay_months"] = int(shock["delay_months"])
+    return shock
+
+
+class DashboardScorer:
+    """The dashboard's debt-ratio / repayment formula (``scripts.scoring.dashboard_default_prob``)."""
+
+    def bind(self, portfolio):
+        return self
+
+    def __call__(self, loan, outstanding, total):
+        return dashboard_default_prob(outstanding, loan, total / np.where(loan == 0, 1, loan) * 100)
+
+
+class ModelScorer:
+    """The trained classifier; categorical columns are encoded once per portfolio, not per scenario."""
+
+    def __init__(self, model, encoder, feature_order=MODEL_FEATURES):
+        self.model = model
+        self.encoder = encoder
+        self.feature_order = list(feature_order)
+        self._categorical = None
+
+    def bind(self, portfolio):
+        self._categorical = self.encoder.transform(portfolio[CATEGORICAL_FEATURES]).astype(np.float64)
+        return self
+
+    def __call__(self, loan, outstanding, total):
+        scenarios, n = outstanding.shape
+        safe_loan = np.where(loan == 0, 1, loan)
+        columns = {name: np.broadcast_to(self._categorical[:, i], (scenarios, n))
+                   for i, name in enumerate(CATEGORICAL_FEATURES)}
+        columns.update({
+            'Loan_Amount': np.broadcast_to(loan, (scenarios, n)),
+            'Outstanding_Balance': outstanding,
+            'Total_Recovery': total,
+            'Repayment_Ratio': total / safe_loan,
+            'Debt_Ratio': outstanding / safe_loan,
+        })
+        X = pd.DataFrame({name: columns[name].ravel() for name in self.feature_order})
+        return self.model.predict_proba(X)[:, 1].reshape(scenarios, n)
+
+
+def prepare_portfolio(portfolio, store=None):
+    """Arrays the engine needs: cumulative recovery (with a leading zero column), balances, division codes.
+
+    The cumulative curves come from ``store`` (a cached ``RecoveryStore`` holding these
+    rows) or from a store built over ``portfolio``.
+    """
+    cumulative = (store or RecoveryStore.from_frame(portfolio)).cumulative_for(portfolio)
+    divisions, codes = np.unique(portfolio['Division'].astype(str).to_numpy(), return_inverse=True)
+    return {
+        'cumulative': np.hstack([np.zeros((len(cumulative), 1)), cumulative]),
+        'loan': portfolio['Loan_Amount'].to_numpy(dtype=np.float64),
+        'outstanding': portfolio['Outstanding_Balance'].to_numpy(dtype=np.float64),
+        'divisions': divisions,
+        'codes': codes,
+        'onehot': np.eye(len(divisions))[codes],
+    }
+
+
+def simulate_chunk(base, scorer, shocks, n_scenarios, seed, lgd=LOSS_GIVEN_DEFAULT):
+    """Losses per division (plus a portfolio total column) for ``n_scenarios`` scenarios."""
+    rng = np.random.default_rng(seed)
+    codes, n_div = base['codes'], len(base['divisions'])
+    n = len(codes)
+    keep = np.ones((n_scenarios, n))
+    delay = np.zeros((n_scenarios, n), dtype=np.intp)
+    for shock in shocks:
+        hit = np.ones(n_div, dtype=bool) if shock['divisions'] is None else np.isin(base['divisions'], shock['divisions'])
+        fires = rng.random(n_scenarios) < shock['probability']
+        # Severity drawn per (scenario, division); unaffected divisions get none
+        cut = np.clip(rng.normal(shock['recovery_cut'], shock['cut_spread'], (n_scenarios, n_div)), 0, 1)
+        cut *= hit & fires[:, None]
+        keep *= (1 - cut)[:, codes]
+        if shock['delay_months']:
+            delayed = (hit & fires[:, None])[:, codes]
+            delay = np.maximum(delay, np.where(delayed, shock['delay_months'], 0))
+
+    base_total = base['cumulative'][:, -1]
+    # Recovery still inside the season after a delay of d months = cumulative up to month 12 - d
+    total = base['cumulative'][np.arange(n), len(MONTHS) - delay] * keep
+    outstanding = base['outstanding'] + (base_total - total)
+    prob = scorer(base['loan'], outstanding, total)
+
+    loss = (rng.random((n_scenarios, n)) < prob) * outstanding * lgd
+    by_division = loss @ base['onehot']
+    return np.column_stack([by_division, by_division.sum(axis=1)]), prob.sum(axis=0) @ base['onehot']
+
+
+_worker_state = {}
+
+
+def _init_worker(base, scorer, shocks, lgd):
+    _worker_state.update(base=base, scorer=scorer, shocks=shocks, lgd=lgd)
+
+
+def _run_chunk(n_scenarios, seed):
+    s = _worker_state
+    return simulate_chunk(s['base'], s['scorer'], s['shocks'], n_scenarios, seed, s['lgd'])
+
+
+def run_stress_test(portfolio, shocks, n_scenarios=5000, scorer=None, lgd=LOSS_GIVEN_DEFAULT, seed=42,
+                    workers=None, max_rows=500_000, store=None):
+    """Run ``n_scenarios`` Monte Carlo scenarios; returns a ``StressResult``."""
+    shocks = [normalize_shock(s) for s in shocks]
+    scorer = (scorer or DashboardScorer()).bind(portfolio)
+    base = prepare_portfolio(portfolio, store)
+    per_chunk = max(1, min(n_scenarios, max_rows // max(len(portfolio), 1)))
+    sizes = [min(per_chunk, n_scenarios - start) for start in range(0, n_scenarios, per_chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    results = []
+    if workers is None:
+        # Time the first chunk; pool the rest only if that saves more than the pool's start-up
+        started = time.perf_counter()
+        results.append(simulate_chunk(base, scorer, shocks, sizes[0], seeds[0], lgd))
+        remaining = (time.perf_counter() - started) * (n_scenarios - sizes[0]) / sizes[0]
+        cores = os.cpu_count() or 1
+        workers = cores if remaining * (1 - 1 / cores) > POOL_STARTUP_SECONDS else 1
+    pending_sizes, pending_seeds = sizes[len(results):], seeds[len(results):]
+    workers = min(workers, len(pending_sizes))
+
+    if workers > 1:
+        # spawn, not fork: the API and the dashboard call this from multi-threaded servers
+        with ProcessPoolExecutor(workers, multiprocessing.get_context("spawn"), initializer=_init_worker,
+                                 initargs=(base, scorer, shocks, lgd)) as pool:
+            results.extend(pool.map(_run_chunk, pending_sizes, pending_seeds))
+    else:
+        results.extend(simulate_chunk(base, scorer, shocks, size, s, lgd) for size, s in zip(pending_sizes, pending_seeds))
+
+    losses = np.vstack([r[0] for r in results])
+    mean_pd = sum(r[1] for r in results) / (n_scenarios * np.maximum(np.bincount(base['codes']), 1))
+    baseline_pd = scorer(base['loan'], base['outstanding'][None, :], base['cumulative'][None, :, -1])[0]
+    return StressResult(base, losses, mean_pd, baseline_pd, shocks, lgd)
+
+
+class StressResult:
+    """Scenario losses (scenarios x divisions + ``Portfolio``) and their summary statistics."""
+
+    def __init__(self, base, losses, mean_pd, baseline_pd, shocks, lgd):
+        self.divisions = list(base['divisions'])
+        self.losses = pd.DataFrame(losses, columns=self.divisions + ['Portfolio'])
+        self.shocks = shocks
+        self.lgd = lgd
+        codes = base['codes']
+        self._exposure = np.bincount(codes, base['outstanding'], len(self.divisions))
+        self._baseline_el = np.bincount(codes, baseline_pd * base['outstanding'] * lgd, len(self.divisions))
+        self._baseline_pd = np.bincount(codes, baseline_pd, len(self.divisions)) / np.maximum(np.bincount(codes), 1)
+        self._mean_pd = mean_pd
+
+    def summary(self):
+        """Per division and for the whole portfolio: exposure, baseline vs stressed expected loss, tail percentiles."""
+        losses = self.losses.to_numpy()
+        tail = np.percentile(losses, PERCENTILES, axis=0)
+        var95 = tail[PERCENTILES.index(95)]
+        # Expected shortfall: mean loss in the worst 5% of scenarios
+        cvar95 = np.array([col[col >= v].mean() for col, v in zip(losses.T, var95)])
+        table = pd.DataFrame({
+            'Exposure': np.append(self._exposure, self._exposure.sum()),
+            'Baseline_PD': np.append(self._baseline_pd, np.nan),
+            'Stressed_PD': np.append(self._mean_pd, np.nan),
+            'Baseline_EL': np.append(self._baseline_el, self._baseline_el.sum()),
+            'Expected_Loss': losses.mean(axis=0),
+            **{f'P{p}_Loss': tail[i] for i, p in enumerate(PERCENTILES)},
+            'CVaR95_Loss': cvar95,
+        }, index=pd.Index(self.divisions + ['Portfolio'], name='Division'))
+        return table
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from scripts.partitioned_store import PARTITION_ROOT, load_partitions
+
+    parser = argparse.ArgumentParser(description="Monte Carlo stress test of the partitioned portfolio.")
+    parser.add_argument("--divisions", nargs="*", default=None, help="shocked divisions (default: all)")
+    parser.add_argument("--cut", type=float, default=0.3, help="mean share of recovery lost")
+    parser.add_argument("--spread", type=float, default=0.1)
+    parser.add_argument("--delay", type=int, default=0, help="months recoveries are delayed")
+    parser.add_argument("--probability", type=float, default=1.0)
+    parser.add_argument("--scenarios", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--model", action="store_true", help="rescore with the trained model instead of the dashboard formula")
+    parser.add_argument("--partitions", default=PARTITION_ROOT)
+    args = parser.parse_args()
+
+    portfolio = load_partitions(args.partitions)
+    scorer = None
+    if args.model:
+        from scripts.scoring import load_model_assets, model_feature_order
+
+        model, encoder = load_model_assets()
+        scorer = ModelScorer(model, encoder, model_feature_order(model))
+    shock = {"divisions": args.divisions, "recovery_cut": args.cut, "cut_spread": args.spread,
+             "delay_months": args.delay, "probability": args.probability}
+    started = time.perf_counter()
+    result = run_stress_test(portfolio, [shock], args.scenarios, scorer, workers=args.workers)
+    print(result.summary().round(3).to_string())
+    print(f"{args.scenarios} scenarios x {len(portfolio)} farmers in {time.perf_counter() - started:.1f}s")
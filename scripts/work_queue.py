@@ -0,0 +1,174 @@
+"""Priority work queue of at-risk farmers, per division.
+
+Each (season, division) pair keeps a binary heap ordered by ``Default_Prob``, then
+``Outstanding_Balance``, then the severity of ``Action_Taken`` (Court over
+Mediation over none), highest first. Rescoring a farmer or recording a payment
+pushes a new heap entry (O(log n)) and marks the old one stale. Top-K queries
+walk only the top of each heap (O(k log k) plus skipped stale entries) and merge
+heaps lazily, so nothing is ever fully re-sorted. A heap is compacted once its stale entries outnumber its live ones.
+"""
+
+import heapq
+import itertools
+import threading
+
+from scripts.scoring import dashboard_default_prob
+
+ACTION_SEVERITY = {
+    "Court": 2, "උසාවි": 2,
+    "Adjudication_Board": 1, "බේරුම්කරණ": 1,
+}
+RECORD_FIELDS = ['Customer_ID', 'Loan_Type', 'Officer_Assigned', 'Division', 'Loan_Amount',
+                 'Outstanding_Balance', 'Total_Paid', 'Action_Taken', 'Default_Prob']
+
+
+def action_severity(action):
+    return ACTION_SEVERITY.get(str(action).strip(), 0)
+
+
+def dashboard_scorer(record):
+    """Rescore one farmer with the dashboard formula (scripts/scoring.py)."""
+    loan = record['Loan_Amount']
+    repayment_percent = record['Total_Paid'] / loan * 100 if loan else 0.0
+    return dashboard_default_prob(record['Outstanding_Balance'], loan, repayment_percent)
+
+
+def _native(value):
+    # NumPy scalars (e.g. from a pandas row) -> plain Python, so records serialize to JSON
+    return value.item() if hasattr(value, 'item') else value
+
+
+def _heap_key(record):
+    return (record['Loan_Type'], record['Division'])
+
+
+def _priority(record):
+    # heapq is a min-heap: negate so the highest-risk farmer sits at the root
+    return (-record['Default_Prob'], -record['Outstanding_Balance'], -action_severity(record['Action_Taken']))
+
+
+class WorkQueue:
+    """Per-(season, division) heaps with lazy invalidation; safe to share between threads."""
+
+    def __init__(self, scorer=dashboard_scorer):
+        self.scorer = scorer
+        self._lock = threading.Lock()
+        self._records = {}   # Customer_ID -> current record (dict)
+        self._heaps = {}     # (Loan_Type, Division) -> [(priority, seq, Customer_ID)]
+        self._live = {}      # Customer_ID -> seq of its current heap entry
+        self._stale = {}     # heap key -> number of stale entries in its heap
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_frame(cls, df, scorer=dashboard_scorer):
+        """Build from a scored portfolio (needs ``RECORD_FIELDS``); one O(n) heapify per heap."""
+        queue = cls(scorer)
+        for record in df[RECORD_FIELDS].to_dict(orient="records"):
+            seq = next(queue._seq)
+            queue._records[record['Customer_ID']] = record
+            queue._live[record['Customer_ID']] = seq
+            queue._heaps.setdefault(_heap_key(record), []).append((_priority(record), seq, record['Customer_ID']))
+        for key, heap in queue._heaps.items():
+            heapq.heapify(heap)
+            queue._stale[key] = 0
+        return queue
+
+    def __len__(self):
+        return len(self._records)
+
+    def divisions(self):
+        return sorted({division for _, division in self._heaps})
+
+    def get(self, customer_id):
+        record = self._records.get(customer_id)
+        return dict(record) if record else None
+
+    def _push(self, record):
+        customer_id = record['Customer_ID']
+        if customer_id in self._live:
+            previous = _heap_key(self._records[customer_id])
+            self._stale[previous] = self._stale.get(previous, 0) + 1
+        seq = next(self._seq)
+        self._records[customer_id] = record
+        self._live[customer_id] = seq
+        key = _heap_key(record)
+        heapq.heappush(self._heaps.setdefault(key, []), (_priority(record), seq, customer_id))
+        self._maybe_compact(key)
+
+    def _maybe_compact(self, key):
+        heap = self._heaps[key]
+        stale = self._stale.get(key, 0)
+        if stale > len(heap) - stale:
+            self._heaps[key] = [e for e in heap if self._live.get(e[2]) == e[1]]
+            heapq.heapify(self._heaps[key])
+            self._stale[key] = 0
+
+    def upsert(self, record):
+        """Insert or replace a farmer; ``Default_Prob`` is computed by the scorer when missing."""
+        record = {field: _native(record.get(field)) for field in RECORD_FIELDS}
+        with self._lock:
+            if record['Default_Prob'] is None:
+                record['Default_Prob'] = float(self.scorer(record))
+            self._push(record)
+            return dict(record)
+
+    def rescore(self, customer_id, default_prob=None):
+        """Update one farmer's risk (recomputed by the scorer when ``default_prob`` is None)."""
+        with self._lock:
+            record = dict(self._records[customer_id])
+            record['Default_Prob'] = float(self.scorer(record) if default_prob is None else default_prob)
+            self._push(record)
+            return dict(record)
+
+    def record_payment(self, customer_id, amount):
+        """Apply a repayment (recovery up, outstanding down) and rescore the farmer."""
+        with self._lock:
+            record = dict(self._records[customer_id])
+            record['Total_Paid'] = record['Total_Paid'] + amount
+            record['Outstanding_Balance'] = max(record['Outstanding_Balance'] - amount, 0.0)
+            record['Default_Prob'] = float(self.scorer(record))
+            self._push(record)
+            return dict(record)
+
+    def record_action(self, customer_id, action_taken):
+        with self._lock:
+            record = dict(self._records[customer_id])
+            record['Action_Taken'] = action_taken
+            self._push(record)
+            return dict(record)
+
+    def remove(self, customer_id):
+        with self._lock:
+            record = self._records.pop(customer_id, None)
+            if record is not None:
+                del self._live[customer_id]
+                key = _heap_key(record)
+                self._stale[key] = self._stale.get(key, 0) + 1
+                self._maybe_compact(key)
+
+    def _iter_heap(self, key):
+        """Live entries of one heap in priority order, visiting only its top."""
+        heap = self._heaps[key]
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier:
+            entry, i = heapq.heappop(frontier)
+            if self._live.get(entry[2]) == entry[1]:
+                yield entry
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+
+    def top(self, k=20, divisions=None, seasons=None, min_prob=None):
+        """The ``k`` highest-priority farmers across ``divisions`` / ``seasons`` (None = all)."""
+        with self._lock:
+            selected = [
+                key for key in self._heaps
+                if (seasons is None or key[0] in seasons) and (divisions is None or key[1] in divisions)
+            ]
+            merged = heapq.merge(*(self._iter_heap(key) for key in selected))
+            result = []
+            for priority, _, customer_id in merged:
+                if len(result) >= k or (min_prob is not None and -priority[0] < min_prob):
+                    break
+                result.append(dict(self._records[customer_id]))
+            return result
@@ -0,0 +1,25 @@
+import pandas as pd
+import pytest
+
+from scripts.recovery_store import MONTHS
+from scripts.scoring import score_portfolio
+
+
+@pytest.fixture
+def portfolio():
+    """Five scored farmers over two divisions of one season (nothing repaid yet)."""
+    df = pd.DataFrame({
+        'Customer_ID': [f"CID-{i:04d}" for i in range(5)],
+        'Loan_Type': '2024_Maha_season',
+        'Officer_Assigned': 'No',
+        'Division': ['Thonigala', 'Thonigala', 'Thonigala', 'Divulwewa', 'Divulwewa'],
+        'Loan_Amount': [100_000, 80_000, 50_000, 60_000, 40_000],
+        'Outstanding_Balance': [100_000, 60_000, 50_000, 30_000, 40_000],
+        'Action_Taken': ['No', 'No', 'Court', 'No', 'No'],
+        'Overdue_Status': 'No',
+    })
+    for month in MONTHS:
+        df[month] = 0
+    df['Total_Paid'] = df[MONTHS].sum(axis=1)
+    df['Repayment_Percent'] = 0.0
+    return score_portfolio(df)
@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from scripts.event_ingest import EventIngestor, EventLog, LivePortfolio, apply_to_work_queue, validate_event
+from scripts.work_queue import WorkQueue
+
+
+def _ingestor(portfolio, path):
+    live = LivePortfolio(portfolio)
+    queue = WorkQueue.from_frame(portfolio)
+    ingestor = EventIngestor(live, EventLog(str(path)), consumers=[lambda event: apply_to_work_queue(queue, event)])
+    return ingestor, queue
+
+
+def test_payment_updates_farmer_and_rollup(portfolio, tmp_path):
+    ingestor, queue = _ingestor(portfolio, tmp_path / "events.jsonl")
+    record = ingestor.ingest({"type": "payment", "customer_id": "CID-0000", "amount": 50_000, "month": "Mar"})
+    assert record['Mar_Recovery'] == 50_000
+    assert record['Outstanding_Balance'] == 50_000
+    assert record['Default_Prob'] == 0.5
+    assert record['Risk_Category'] == 'Medium Risk'
+    assert queue.get('CID-0000')['Default_Prob'] == 0.5
+
+    rollup = ingestor.live.rollup().set_index('Division')
+    assert rollup.loc['Thonigala', 'Total_Paid'] == 50_000
+    assert rollup.loc['Thonigala', 'Outstanding_Balance'] == 160_000
+    assert rollup.loc['Thonigala', 'High_Risk_Count'] == 2
+
+
+def test_overpayment_is_rejected_and_not_logged(portfolio, tmp_path):
+    path = tmp_path / "events.jsonl"
+    ingestor, _ = _ingestor(portfolio, path)
+    with pytest.raises(ValueError):
+        ingestor.ingest({"type": "payment", "customer_id": "CID-0003", "amount": 30_001, "month": "Jan"})
+    with pytest.raises(KeyError):
+        ingestor.ingest({"type": "payment", "customer_id": "CID-9999", "amount": 1, "month": "Jan"})
+    assert not path.exists()
+    assert ingestor.live.record('CID-0003')['Outstanding_Balance'] == 30_000
+
+
+@pytest.mark.parametrize("event", [
+    {"type": "refund", "customer_id": "CID-0000"},
+    {"type": "payment", "customer_id": "CID-0000", "amount": -5},
+    {"type": "payment", "customer_id": "CID-0000", "amount": 5, "month": "Smarch"},
+    {"type": "action", "customer_id": "CID-0000", "action": "Sue"},
+])
+def test_malformed_events_are_rejected(event):
+    with pytest.raises(ValueError):
+        validate_event(event)
+
+
+def test_replaying_the_log_rebuilds_the_live_state(portfolio, tmp_path):
+    path = tmp_path / "events.jsonl"
+    ingestor, queue = _ingestor(portfolio, path)
+    ingestor.ingest({"type": "payment", "customer_id": "CID-0001", "amount": 20_000, "month": "Feb"})
+    ingestor.ingest({"type": "payment", "customer_id": "CID-0001", "amount": 40_000, "month": "Apr"})
+    ingestor.ingest({"type": "action", "customer_id": "CID-0003", "action": "Court"})
+
+    replayed, replayed_queue = _ingestor(portfolio, path)
+    assert replayed.live.applied == 3
+    for customer_id in portfolio['Customer_ID']:
+        assert replayed.live.record(customer_id) == ingestor.live.record(customer_id)
+        assert replayed_queue.get(customer_id) == queue.get(customer_id)
+    assert_frame_equal(replayed.live.rollup(), ingestor.live.rollup())
+    assert replayed.live.status_counts() == ingestor.live.status_counts()
+    assert replayed.live.record('CID-0001')['Outstanding_Balance'] == 0
+
+
+def test_catch_up_applies_events_from_another_writer(portfolio, tmp_path):
+    path = tmp_path / "events.jsonl"
+    writer, _ = _ingestor(portfolio, path)
+    reader, _ = _ingestor(portfolio, path)
+    writer.ingest({"type": "payment", "customer_id": "CID-0004", "amount": 10_000, "month": "May"})
+    assert reader.live.record('CID-0004')['Outstanding_Balance'] == 40_000
+    assert reader.catch_up() == 1
+    assert reader.live.record('CID-0004') == writer.live.record('CID-0004')
+    assert reader.catch_up() == 0
+
+
+def test_patch_keeps_column_dtypes(portfolio, tmp_path):
+    ingestor, _ = _ingestor(portfolio, tmp_path / "events.jsonl")
+    ingestor.ingest({"type": "payment", "customer_id": "CID-0002", "amount": 5_000, "month": "Jan"})
+    frame = portfolio.iloc[::-1].copy()
+    patched = ingestor.live.patch(frame)
+    assert patched['Jan_Recovery'].dtype == frame['Jan_Recovery'].dtype == 'int64'
+    assert isinstance(patched['Risk_Category'].dtype, pd.CategoricalDtype)
+    assert patched.set_index('Customer_ID').loc['CID-0002', 'Outstanding_Balance'] == 45_000
+    assert frame.set_index('Customer_ID').loc['CID-0002', 'Outstanding_Balance'] == 50_000
@@ -0,0 +1,51 @@
+from scripts.work_queue import WorkQueue
+
+
+def _ids(records):
+    return [r['Customer_ID'] for r in records]
+
+
+def test_top_orders_by_risk_then_balance(portfolio):
+    queue = WorkQueue.from_frame(portfolio)
+    assert _ids(queue.top(5)) == ['CID-0000', 'CID-0002', 'CID-0004', 'CID-0001', 'CID-0003']
+    assert _ids(queue.top(2, divisions=['Divulwewa'])) == ['CID-0004', 'CID-0003']
+
+
+def test_top_k_after_payment(portfolio):
+    queue = WorkQueue.from_frame(portfolio)
+    record = queue.record_payment('CID-0000', 50_000)
+    assert record['Outstanding_Balance'] == 50_000
+    assert record['Default_Prob'] == 0.5
+    assert _ids(queue.top(3)) == ['CID-0002', 'CID-0004', 'CID-0001']
+    assert queue.top(5)[-1] == record
+
+
+def test_top_skips_stale_entries(portfolio):
+    queue = WorkQueue.from_frame(portfolio)
+    queue.rescore('CID-0003', default_prob=0.99)
+    queue.rescore('CID-0003', default_prob=0.1)
+    queue.remove('CID-0004')
+    top = _ids(queue.top(10))
+    assert top == ['CID-0000', 'CID-0002', 'CID-0001', 'CID-0003']
+    assert queue.top(1, divisions=['Divulwewa'])[0]['Default_Prob'] == 0.1
+
+
+def test_compaction_bounds_heap_size(portfolio):
+    queue = WorkQueue.from_frame(portfolio)
+    key = ('2024_Maha_season', 'Thonigala')
+    for i in range(100):
+        queue.rescore('CID-0001', default_prob=i / 100)
+    heap = queue._heaps[key]
+    assert len(heap) <= 2 * 3
+    assert queue._stale[key] == len(heap) - 3
+    assert _ids(queue.top(3, divisions=['Thonigala'])) == ['CID-0000', 'CID-0002', 'CID-0001']
+
+
+def test_action_breaks_ties(portfolio):
+    queue = WorkQueue.from_frame(portfolio)
+    queue.upsert({**queue.get('CID-0004'), 'Outstanding_Balance': 50_000})
+    # Same risk and balance: the Court referral ranks first
+    assert _ids(queue.top(3)) == ['CID-0000', 'CID-0002', 'CID-0004']
+    queue.record_action('CID-0002', 'No')
+    queue.record_action('CID-0004', 'Adjudication_Board')
+    assert _ids(queue.top(3)) == ['CID-0000', 'CID-0004', 'CID-0002']